@@ -1,10 +1,16 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+import hashlib
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 
+from cache import TTLCache
+from hashing import password_hasher
+
 load_dotenv()
 
 # JWT Configuration
@@ -15,7 +21,80 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Embed email/is_active/subscription claims in access tokens so get_current_user
+# can authorize without a database lookup. Claims are trusted for the token's
+# lifetime, so deactivation or cancellation takes effect at expiry.
+JWT_EMBED_CLAIMS = os.getenv("JWT_EMBED_CLAIMS", "false").lower() == "true"
+
+# JWT library: "jose" (python-jose) or "pyjwt" (PyJWT)
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
+# Verified-token cache: a client sends the same token for its whole lifetime,
+# so signature checks are memoized until the token's exp (at most JWT_CACHE_TTL)
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+JWT_CACHE_TTL = float(os.getenv("JWT_CACHE_TTL", "300"))
+
+if JWT_BACKEND == "pyjwt":
+    import jwt as pyjwt
+
+    def _jwt_encode(claims: dict) -> str:
+        return pyjwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+    def _jwt_decode(token: str) -> Optional[dict]:
+        try:
+            return pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except pyjwt.PyJWTError:
+            return None
+elif JWT_BACKEND == "jose":
+    def _jwt_encode(claims: dict) -> str:
+        return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+    def _jwt_decode(token: str) -> Optional[dict]:
+        try:
+            return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+else:
+    raise ValueError(f"Unknown JWT_BACKEND: {JWT_BACKEND}")
+
+# sha256(token) -> verified payload
+token_cache = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=JWT_CACHE_TTL)
+
+# Password hashing cost. Hashes made with another scheme or other parameters
+# still verify and are rewritten at the configured cost on the next login.
+# Pick values for the deployment hardware with `python -m calibrate_hashing`.
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")  # "bcrypt" or "argon2"
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+def build_password_context(
+    scheme: str = PASSWORD_HASH_SCHEME,
+    bcrypt_rounds: int = BCRYPT_ROUNDS,
+    argon2_time_cost: int = ARGON2_TIME_COST,
+    argon2_memory_cost: int = ARGON2_MEMORY_COST,
+    argon2_parallelism: int = ARGON2_PARALLELISM,
+) -> CryptContext:
+    """CryptContext hashing with `scheme`; any other cost or scheme needs an update"""
+    if scheme not in ("bcrypt", "argon2"):
+        raise ValueError(f"Unknown PASSWORD_HASH_SCHEME: {scheme}")
+    return CryptContext(
+        schemes=[scheme] + [other for other in ("bcrypt", "argon2") if other != scheme],
+        default=scheme,
+        deprecated="auto",
+        # min == max == default: hashes at a lower *or* higher cost are upgraded,
+        # so lowering the cost to meet a latency target also takes effect
+        bcrypt__default_rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        bcrypt__max_rounds=bcrypt_rounds,
+        argon2__default_rounds=argon2_time_cost,
+        argon2__min_rounds=argon2_time_cost,
+        argon2__max_rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+pwd_context = build_password_context()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -25,6 +104,22 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also return a new hash if the stored one is outdated"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool without blocking the event loop"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password on the hashing pool"""
+    return await password_hasher.run(verify_and_update_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool without blocking the event loop"""
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -33,14 +128,23 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    # jti identifies the token for revocation (logout)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    return _jwt_encode(to_encode)
 
 def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and validate a JWT access token"""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    """Decode and validate a JWT access token.
+
+    Verified payloads are cached and shared between requests; treat them as
+    read-only. Revocation is checked by the caller on every request.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
         return payload
-    except JWTError:
-        return None
\ No newline at end of file
+    payload = _jwt_decode(token)
+    if payload is not None and JWT_CACHE_SIZE:
+        remaining = payload.get("exp", 0) - time.time()
+        if remaining > 0:
+            token_cache.set(key, payload, ttl=min(JWT_CACHE_TTL, remaining))
+    return payload
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""Minimal local stand-in for the Stripe API used by tests and benchmarks.
+
+Run standalone with `uvicorn benchmarks.fake_stripe:app --port 12111` and point
+STRIPE_API_BASE at it, or mount it in-process with httpx.ASGITransport.
+"""
+from typing import List
+import asyncio
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake Stripe")
+
+# Test controls: queued failure statuses and an artificial latency
+app.state.requests: List[dict] = []
+app.state.fail_statuses: List[int] = []
+app.state.latency = 0.0
+app.state.sessions = {}
+
+def reset():
+    app.state.requests = []
+    app.state.fail_statuses = []
+    app.state.latency = 0.0
+    app.state.sessions = {}
+
+@app.post("/v1/checkout/sessions")
+async def create_checkout_session(request: Request):
+    form = dict((await request.form()).multi_items())
+    idempotency_key = request.headers.get("idempotency-key")
+    app.state.requests.append({"form": form, "idempotency_key": idempotency_key})
+    if app.state.latency:
+        await asyncio.sleep(app.state.latency)
+    if app.state.fail_statuses:
+        status_code = app.state.fail_statuses.pop(0)
+        return JSONResponse(
+            status_code=status_code,
+            content={"error": {"type": "api_error", "message": f"Injected {status_code}"}},
+        )
+    if idempotency_key in app.state.sessions:
+        return app.state.sessions[idempotency_key]
+    session_id = f"cs_test_{uuid.uuid4().hex}"
+    session = {
+        "id": session_id,
+        "object": "checkout.session",
+        "mode": form.get("mode"),
+        "metadata": {
+            "user_id": form.get("metadata[user_id]"),
+            "plan_type": form.get("metadata[plan_type]"),
+        },
+        "url": f"https://checkout.stripe.test/pay/{session_id}",
+    }
+    app.state.sessions[idempotency_key] = session
+    return session
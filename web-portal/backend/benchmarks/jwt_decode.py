@@ -0,0 +1,46 @@
+"""Microbenchmark for access-token verification.
+
+Compares decoding a token with python-jose (the original path), with PyJWT,
+and a repeat decode_access_token call answered from the verified-token cache.
+
+    python -m benchmarks.jwt_decode --number 20000
+"""
+from typing import Callable, Dict
+import argparse
+import timeit
+
+import jwt as pyjwt
+from jose import jwt as jose_jwt
+
+from auth import ALGORITHM, SECRET_KEY, create_access_token, decode_access_token, token_cache
+
+
+def cases(token: str) -> Dict[str, Callable[[], object]]:
+    return {
+        "jose": lambda: jose_jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]),
+        "pyjwt": lambda: pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]),
+        "cached": lambda: decode_access_token(token),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JWT decode microbenchmark")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the best is reported")
+    args = parser.parse_args(argv)
+
+    token = create_access_token({"sub": "42", "email": "bench@example.com"})
+    token_cache.clear()
+    decode_access_token(token)  # populate the cache
+
+    timings = {}
+    for variant, fn in cases(token).items():
+        best = min(timeit.repeat(fn, number=args.number, repeat=args.repeat))
+        timings[variant] = best / args.number * 1e6
+    print(f"{'variant':<8} {'us/call':>9} {'speedup':>8}")
+    for variant, micros in timings.items():
+        print(f"{variant:<8} {micros:>9.2f} {timings['jose'] / micros:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Microbenchmark for the per-request principal lookup on a cache miss.
+
+Compares the previous ORM path (session.get(User) followed by an ORM query
+for the active subscription) with load_principal's single prebuilt Core
+statement. Each lookup uses a fresh session, as a request would. Runs against
+a throwaway SQLite file unless --database-url points elsewhere.
+
+    python -m benchmarks.principal_lookup --number 2000
+"""
+from datetime import datetime
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database import Base
+from entitlements import Entitlement
+from models import User, UserSubscription
+from principals import UserPrincipal, load_principal
+
+USERS = 1000
+
+
+async def orm_lookup(db, user_id: int):
+    user = await db.get(User, user_id)
+    result = await db.execute(
+        select(UserSubscription).where(
+            UserSubscription.user_id == user_id,
+            UserSubscription.is_active == True
+        )
+    )
+    subscription = result.scalars().first()
+    entitlement = Entitlement.from_subscription(subscription) if subscription is not None else None
+    return UserPrincipal(id=user.id, email=user.email, is_active=bool(user.is_active)), entitlement
+
+
+async def core_lookup(db, user_id: int):
+    return await load_principal(db, user_id)
+
+
+async def seed(sessionmaker):
+    async with sessionmaker() as db:
+        for user_id in range(1, USERS + 1):
+            db.add(User(id=user_id, email=f"user{user_id}@example.com", hashed_password="x",
+                        full_name="Bench User", is_active=True))
+            if user_id % 2:
+                db.add(UserSubscription(user_id=user_id, plan_type="monthly", is_active=True,
+                                        created_at=datetime(2026, 1, 1)))
+        await db.commit()
+
+
+async def run(database_url: str, number: int, repeat: int):
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    sessionmaker = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    await seed(sessionmaker)
+
+    timings = {}
+    for name, lookup in (("orm", orm_lookup), ("core", core_lookup)):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for i in range(number):
+                async with sessionmaker() as db:
+                    await lookup(db, i % USERS + 1)
+            best = min(best, time.perf_counter() - started)
+        timings[name] = best / number * 1e6
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+    print(f"{'path':<6} {'us/lookup':>10} {'speedup':>8}")
+    for name, micros in timings.items():
+        print(f"{name:<6} {micros:>10.1f} {timings['orm'] / micros:>7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Principal lookup microbenchmark")
+    parser.add_argument("--number", type=int, default=2000, help="Lookups per timing run")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs; the best is reported")
+    parser.add_argument("--database-url", help="Async SQLAlchemy URL (its tables are dropped!)")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        asyncio.run(run(args.database_url, args.number, args.repeat))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", args.number, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Microbenchmark for request validation and response serialization.
+
+Compares the register/profile hot paths as they were (five regex scans per
+password, hand-built models, jsonable_encoder + json.dumps) with the current
+ones (single-pass password check, from_attributes, orjson).
+
+    python -m benchmarks.serialization --number 20000
+"""
+from datetime import datetime
+from typing import Callable, Dict
+import argparse
+import re
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from entitlements import Entitlement
+from models import User
+from schemas import SubscriptionInfo, UserCreate, UserResponse, check_password_strength
+
+REGISTER_PAYLOAD = {
+    "email": "bench@example.com",
+    "password": "BenchPassword123!",
+    "full_name": "  Bench User  ",
+}
+
+
+def legacy_password_check(v: str):
+    """The previous validator: a length check and five separate regex scans"""
+    if len(v) < 12:
+        raise ValueError('Password must be at least 12 characters long')
+    if not re.search(r'[A-Z]', v):
+        raise ValueError('Password must contain at least one uppercase letter')
+    if not re.search(r'[a-z]', v):
+        raise ValueError('Password must contain at least one lowercase letter')
+    if not re.search(r'\d', v):
+        raise ValueError('Password must contain at least one number')
+    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', v):
+        raise ValueError('Password must contain at least one special character')
+    return v
+
+
+def _user() -> User:
+    return User(id=42, email="bench@example.com", hashed_password="x", full_name="Bench User",
+                is_active=True, created_at=datetime(2026, 1, 1, 12, 0, 0))
+
+
+ENTITLEMENT = Entitlement(plan_type="monthly", status="active", created_at=datetime(2026, 1, 2))
+
+
+def legacy_profile_body(user: User) -> bytes:
+    response = UserResponse(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        is_active=user.is_active,
+        created_at=user.created_at,
+    )
+    response.subscription = SubscriptionInfo(
+        plan_type=ENTITLEMENT.plan_type, status=ENTITLEMENT.status, created_at=ENTITLEMENT.created_at)
+    return JSONResponse(jsonable_encoder(response)).body
+
+
+def current_profile_body(user: User) -> bytes:
+    response = UserResponse.model_validate(user)
+    response.subscription = SubscriptionInfo.model_validate(ENTITLEMENT)
+    return ORJSONResponse(response.model_dump(mode="json")).body
+
+
+def cases() -> Dict[str, Dict[str, Callable[[], object]]]:
+    user = _user()
+    password = REGISTER_PAYLOAD["password"]
+    return {
+        "password check": {
+            "legacy": lambda: legacy_password_check(password),
+            "current": lambda: check_password_strength(password),
+        },
+        "register request": {
+            "current": lambda: UserCreate.model_validate(REGISTER_PAYLOAD),
+        },
+        "register response": {
+            "legacy": lambda: JSONResponse(jsonable_encoder(UserResponse(
+                id=user.id, email=user.email, full_name=user.full_name,
+                is_active=user.is_active, created_at=user.created_at))).body,
+            "current": lambda: ORJSONResponse(UserResponse.model_validate(user).model_dump(mode="json")).body,
+        },
+        "profile response": {
+            "legacy": lambda: legacy_profile_body(user),
+            "current": lambda: current_profile_body(user),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validation/serialization microbenchmark")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the best is reported")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<18} {'variant':<8} {'us/call':>9} {'speedup':>8}")
+    for case, variants in cases().items():
+        timings = {}
+        for variant, fn in variants.items():
+            best = min(timeit.repeat(fn, number=args.number, repeat=args.repeat))
+            timings[variant] = best / args.number * 1e6
+        for variant, micros in timings.items():
+            speedup = f"{timings['legacy'] / micros:.2f}x" if "legacy" in timings else ""
+            print(f"{case:<18} {variant:<8} {micros:>9.2f} {speedup:>8}")
+
+
+if __name__ == "__main__":
+    main()
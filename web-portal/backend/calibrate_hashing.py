@@ -0,0 +1,100 @@
+"""Pick password hashing parameters for a target hash time on this machine.
+
+    python -m calibrate_hashing --target-ms 250
+    python -m calibrate_hashing --scheme argon2 --target-ms 200 --memory-cost 65536
+
+Prints the environment settings to deploy. Run it on the production hardware
+(or an identical instance); each login costs one hash on the hashing pool, so
+PASSWORD_HASH_WORKERS / hash time bounds logins per second per worker process.
+"""
+from typing import Callable, List, Tuple
+import argparse
+import time
+
+from auth import build_password_context
+from hashing import HASH_WORKERS
+
+SAMPLE_PASSWORD = "CalibrationPassword123!"
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+ARGON2_MAX_TIME_COST = 20
+
+
+def measure(hash_fn: Callable[[str], str], samples: int) -> float:
+    """Median seconds per hash"""
+    hash_fn(SAMPLE_PASSWORD)  # warm up backend loading
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hash_fn(SAMPLE_PASSWORD)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def calibrate_bcrypt(target: float, samples: int) -> Tuple[dict, List[Tuple[int, float]]]:
+    """Highest rounds whose hash time stays within target (cost doubles per round)"""
+    measured = []
+    best = BCRYPT_MIN_ROUNDS
+    for rounds in range(BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS + 1):
+        seconds = measure(build_password_context("bcrypt", bcrypt_rounds=rounds).hash, samples)
+        measured.append((rounds, seconds))
+        if seconds > target:
+            break
+        best = rounds
+    return {"PASSWORD_HASH_SCHEME": "bcrypt", "BCRYPT_ROUNDS": best}, measured
+
+
+def calibrate_argon2(target: float, samples: int, memory_cost: int, parallelism: int
+                     ) -> Tuple[dict, List[Tuple[int, float]]]:
+    """Highest time cost within target at a fixed memory cost and parallelism"""
+    measured = []
+    best = 1
+    for time_cost in range(1, ARGON2_MAX_TIME_COST + 1):
+        context = build_password_context("argon2", argon2_time_cost=time_cost,
+                                         argon2_memory_cost=memory_cost, argon2_parallelism=parallelism)
+        seconds = measure(context.hash, samples)
+        measured.append((time_cost, seconds))
+        if seconds > target:
+            break
+        best = time_cost
+    settings = {
+        "PASSWORD_HASH_SCHEME": "argon2",
+        "ARGON2_TIME_COST": best,
+        "ARGON2_MEMORY_COST": memory_cost,
+        "ARGON2_PARALLELISM": parallelism,
+    }
+    return settings, measured
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate password hashing cost")
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Target time per hash")
+    parser.add_argument("--samples", type=int, default=5, help="Hashes timed per setting")
+    parser.add_argument("--memory-cost", type=int, default=65536, help="argon2 memory in KiB")
+    parser.add_argument("--parallelism", type=int, default=4, help="argon2 lanes")
+    args = parser.parse_args(argv)
+
+    target = args.target_ms / 1000
+    if args.scheme == "bcrypt":
+        settings, measured = calibrate_bcrypt(target, args.samples)
+        label, key = "rounds", "BCRYPT_ROUNDS"
+    else:
+        settings, measured = calibrate_argon2(target, args.samples, args.memory_cost, args.parallelism)
+        label, key = "time_cost", "ARGON2_TIME_COST"
+
+    print(f"{label:>9} {'ms/hash':>9}")
+    for value, seconds in measured:
+        print(f"{value:>9} {seconds * 1000:>9.1f}")
+    chosen = dict(measured)[settings[key]]
+    if chosen > target:
+        print(f"\nWarning: even the cheapest setting takes {chosen * 1000:.0f}ms (> {args.target_ms:.0f}ms)")
+    print(f"\n# ~{chosen * 1000:.0f}ms per hash; about {HASH_WORKERS / chosen:.0f} logins/s "
+          f"per process with PASSWORD_HASH_WORKERS={HASH_WORKERS}")
+    for key, value in settings.items():
+        print(f"{key}={value}")
+
+
+if __name__ == "__main__":
+    main()
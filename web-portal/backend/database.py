@@ -1,22 +1,246 @@
-from sqlalchemy import create_engine
+from fastapi import Depends
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url, Engine, URL
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Callable, Optional
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Database URL from environment variable
+# Database URL from environment variable (required once an engine is first used)
 DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL environment variable is required")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Optional read replica; get_read_db sessions go here while writes stay on the primary
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# Connection pool configuration (per worker process; ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Drivers used for each backend. DATABASE_URL may name either flavour
+# (e.g. postgresql:// or postgresql+asyncpg://); the other is derived from it.
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+SYNC_DRIVERS = {"postgresql": "psycopg2", "sqlite": "pysqlite"}
+
+def to_async_url(url: str) -> URL:
+    """Return the asyncio-driver variant of a database URL"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported database backend for async engine: {backend}")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+def to_sync_url(url: str) -> URL:
+    """Return the blocking-driver variant of a database URL (DDL and scripts)"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in SYNC_DRIVERS:
+        return parsed
+    return parsed.set(drivername=f"{backend}+{SYNC_DRIVERS[backend]}")
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            # Only pool exhaustion; connect/auth failures are not a pool problem
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.wait_count += 1
+                self.wait_total += waited
+                if waited > self.wait_max:
+                    self.wait_max = waited
+
+def _pool_kwargs(url: URL) -> dict:
+    """Pool settings for a server database; SQLite keeps the dialect default"""
+    if url.get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def create_app_engine(url: str) -> AsyncEngine:
+    """Create an async engine with the configured pool settings"""
+    async_url = to_async_url(url)
+    return create_async_engine(async_url, **_pool_kwargs(async_url))
+
+def _require_database_url() -> str:
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL environment variable is required")
+    return DATABASE_URL
+
+# Engines are created on first use, so importing the app needs no database
+_engines: dict = {}
+_engines_lock = threading.Lock()
+
+def _get_or_create_engine(name: str, factory: Callable):
+    engine = _engines.get(name)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(name)
+            if engine is None:
+                engine = _engines[name] = factory()
+    return engine
+
+def get_async_engine() -> AsyncEngine:
+    """Primary engine used for request handling"""
+    return _get_or_create_engine("primary", lambda: create_app_engine(_require_database_url()))
+
+def get_replica_engine() -> Optional[AsyncEngine]:
+    """Read-replica engine, or None when no replica is configured"""
+    if not DATABASE_REPLICA_URL:
+        return None
+    return _get_or_create_engine("replica", lambda: create_app_engine(DATABASE_REPLICA_URL))
+
+def get_engine() -> Engine:
+    """Blocking engine, only used for schema management"""
+    return _get_or_create_engine("sync", lambda: create_engine(to_sync_url(_require_database_url())))
+
+def has_replica() -> bool:
+    return bool(DATABASE_REPLICA_URL)
+
+async def dispose_engines():
+    """Close all pooled connections (worker shutdown)"""
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        if isinstance(engine, AsyncEngine):
+            await engine.dispose()
+        else:
+            engine.dispose()
+
+# Request handling goes through the async engine so DB round-trips don't block
+# the event loop; sessions are bound to the lazily created engines per call.
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
+async def get_db():
+    """Yield an AsyncSession for the duration of a request"""
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
+
+async def get_read_db(db: AsyncSession = Depends(get_db)):
+    """Yield a session for read-only queries (the replica when one is configured)
+
+    Without a replica this is the request's primary session, so no extra
+    connection is checked out.
+    """
+    replica = get_replica_engine()
+    if replica is None:
+        yield db
+        return
+    async with AsyncSessionLocal(bind=replica) as read_db:
+        yield read_db
+
+def _pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+        })
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                "checkouts": pool.wait_count,
+                "timeouts": pool.timeouts,
+                "wait_avg_ms": (pool.wait_total / pool.wait_count * 1000) if pool.wait_count else 0.0,
+                "wait_max_ms": pool.wait_max * 1000,
+            })
+    return stats
+
+def pool_stats() -> dict:
+    """Connection pool statistics for this worker process"""
+    stats = {"pid": os.getpid(), "primary": _pool_stats(get_async_engine())}
+    replica = get_replica_engine()
+    if replica is not None:
+        stats["replica"] = _pool_stats(replica)
+    return stats
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+# Revision matching the schema create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+
+def alembic_config(connection=None):
+    """Alembic config for programmatic use; reuses the given connection if any"""
+    from alembic.config import Config
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+class SchemaOutOfDate(RuntimeError):
+    """Raised at startup when the database is not at the latest migration"""
+
+    def __init__(self, current: Optional[str], head: Optional[str]):
+        super().__init__(
+            f"Database schema is at revision {current or 'none'}, expected {head}; "
+            "run `alembic upgrade head`"
+        )
+        self.current = current
+        self.head = head
+
+def schema_head() -> Optional[str]:
+    """Latest migration revision shipped with this code"""
+    from alembic.script import ScriptDirectory
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+async def verify_schema(engine: Optional[AsyncEngine] = None):
+    """Check the database is at the latest migration without changing it"""
+    from alembic.runtime.migration import MigrationContext
+    engine = engine or get_async_engine()
+    async with engine.connect() as connection:
+        current = await connection.run_sync(
+            lambda sync_conn: MigrationContext.configure(sync_conn).get_current_revision()
+        )
+    head = schema_head()
+    if current != head:
+        raise SchemaOutOfDate(current, head)
+
 def init_db():
-    """Initialize database tables"""
-    from models import User, UserSubscription
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """Bring the database schema up to date with Alembic migrations"""
+    from alembic import command
+    from sqlalchemy import inspect
+    with get_engine().begin() as connection:
+        config = alembic_config(connection)
+        tables = inspect(connection).get_table_names()
+        if "users" in tables and "alembic_version" not in tables:
+            # Database was created by Base.metadata.create_all; adopt it
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
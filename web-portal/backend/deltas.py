@@ -0,0 +1,42 @@
+"""Binary patches between app releases (zstd "patch-from").
+
+A patch is the new installer compressed with the old one as a raw-content
+dictionary, so unchanged regions cost a few bytes of match references. Any
+zstd can apply it:
+
+    zstd -d --long=31 --patch-from=LegalToolkit_1.3.0_x64-setup.exe patch.zst -o setup.exe
+"""
+import math
+import os
+import zstandard as zstd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Compression level for patches; they are built once per release, so favour size
+RELEASE_DELTA_LEVEL = int(os.getenv("RELEASE_DELTA_LEVEL", "19"))
+WINDOW_LOG_MIN = 10
+WINDOW_LOG_MAX = 31
+
+
+def window_log(old_size: int, new_size: int) -> int:
+    """Window covering both files, so matches can reach anywhere in the old one"""
+    needed = math.ceil(math.log2(max(old_size + new_size, 1)))
+    return max(WINDOW_LOG_MIN, min(WINDOW_LOG_MAX, needed))
+
+
+def make_patch(old: bytes, new: bytes, level: int = RELEASE_DELTA_LEVEL) -> bytes:
+    params = zstd.ZstdCompressionParameters.from_level(
+        level,
+        source_size=len(new),
+        window_log=window_log(len(old), len(new)),
+        enable_ldm=True,
+    )
+    dictionary = zstd.ZstdCompressionDict(old, dict_type=zstd.DICT_TYPE_RAWCONTENT)
+    return zstd.ZstdCompressor(dict_data=dictionary, compression_params=params).compress(new)
+
+
+def apply_patch(old: bytes, patch: bytes) -> bytes:
+    dictionary = zstd.ZstdCompressionDict(old, dict_type=zstd.DICT_TYPE_RAWCONTENT)
+    decompressor = zstd.ZstdDecompressor(dict_data=dictionary, max_window_size=1 << WINDOW_LOG_MAX)
+    return decompressor.decompress(patch)
@@ -0,0 +1,191 @@
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Dict, Mapping, Optional, Tuple
+import hashlib
+import os
+import anyio
+from dotenv import load_dotenv
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from metrics import DOWNLOADS_IN_PROGRESS
+
+load_dotenv()
+
+# App binary served by /download/app/file
+APP_DOWNLOAD_PATH = os.getenv("APP_DOWNLOAD_PATH", "releases/app")
+APP_DOWNLOAD_NAME = os.getenv("APP_DOWNLOAD_NAME", "")
+# Concurrent transfers per worker; beyond this clients get 503 + Retry-After.
+# Each transfer holds one chunk in memory at a time.
+DOWNLOAD_MAX_CONCURRENT = int(os.getenv("DOWNLOAD_MAX_CONCURRENT", "32"))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+DOWNLOAD_RETRY_AFTER = int(os.getenv("DOWNLOAD_RETRY_AFTER", "5"))
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+class RangeNotSatisfiable(Exception):
+    """A well-formed Range header that lies outside the file"""
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    path: str
+    size: int
+    mtime_ns: int
+    etag: str  # strong: quoted SHA-256 of the content
+
+
+_file_info: Dict[str, FileInfo] = {}
+
+
+def _hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+async def load_file_info(path: str) -> FileInfo:
+    """Size and ETag of a file; the digest is recomputed only when the file changes"""
+    st = os.stat(path)
+    cached = _file_info.get(path)
+    if cached is not None and cached.size == st.st_size and cached.mtime_ns == st.st_mtime_ns:
+        return cached
+    digest = await anyio.to_thread.run_sync(_hash_file, path)
+    info = FileInfo(path=path, size=st.st_size, mtime_ns=st.st_mtime_ns, etag=f'"{digest}"')
+    _file_info[path] = info
+    return info
+
+
+async def app_binary_info() -> FileInfo:
+    return await load_file_info(APP_DOWNLOAD_PATH)
+
+
+def app_binary_name() -> str:
+    return APP_DOWNLOAD_NAME or os.path.basename(APP_DOWNLOAD_PATH)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, so W/ prefixes are ignored)"""
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or etag in [candidate.removeprefix("W/") for candidate in candidates]
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single byte range, or None to send the whole file.
+
+    Malformed and multi-range headers are ignored, as RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    first, last = (part.strip() for part in spec.split("-", 1))
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+class DownloadSlots:
+    """Per-worker cap on concurrent file transfers (event loop only, no locking)"""
+
+    def __init__(self, limit: int = DOWNLOAD_MAX_CONCURRENT):
+        self.limit = limit
+        self.active = 0
+
+    def try_acquire(self) -> bool:
+        if self.active >= self.limit:
+            return False
+        self.active += 1
+        DOWNLOADS_IN_PROGRESS.inc()
+        return True
+
+    def release(self):
+        self.active -= 1
+        DOWNLOADS_IN_PROGRESS.dec()
+
+
+download_slots = DownloadSlots()
+
+
+class FileRangeResponse(Response):
+    """Stream a file or a byte range of it.
+
+    Uses the server's zero-copy sendfile extension when it advertises one;
+    otherwise DOWNLOAD_CHUNK_SIZE chunks are read with pread in a worker
+    thread, so disk reads never block the event loop and a transfer never
+    buffers more than one chunk.
+    """
+
+    def __init__(self, info: FileInfo, byte_range: Optional[Tuple[int, int]] = None,
+                 headers: Optional[Mapping[str, str]] = None, media_type: str = "application/octet-stream",
+                 send_body: bool = True, on_close: Optional[Callable[[], None]] = None):
+        self.info = info
+        self.start, self.end = byte_range if byte_range else (0, info.size - 1)
+        self.send_body = send_body
+        self.on_close = on_close
+        self.status_code = 206 if byte_range else 200
+        self.media_type = media_type
+        self.background = None
+        self.body = b""
+        self.init_headers(headers)
+        self.headers["content-length"] = str(self.end - self.start + 1)
+        if byte_range:
+            self.headers["content-range"] = f"bytes {self.start}-{self.end}/{info.size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if not self.send_body or self.end < self.start:
+                await send({"type": "http.response.body", "body": b""})
+            elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                with open(self.info.path, "rb") as f:
+                    await send({"type": ZEROCOPY_EXTENSION, "file": f.fileno(),
+                                "offset": self.start, "count": self.end - self.start + 1})
+            else:
+                async with anyio.create_task_group() as task_group:
+                    async def wrap(func):
+                        await func()
+                        task_group.cancel_scope.cancel()
+
+                    task_group.start_soon(wrap, partial(self._send_chunks, send))
+                    await wrap(partial(self._listen_for_disconnect, receive))
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+    async def _send_chunks(self, send: Send):
+        with open(self.info.path, "rb") as f:
+            fd = f.fileno()
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, self.start, self.end - self.start + 1, os.POSIX_FADV_SEQUENTIAL)
+            stop = self.end + 1
+            for offset in range(self.start, stop, DOWNLOAD_CHUNK_SIZE):
+                size = min(DOWNLOAD_CHUNK_SIZE, stop - offset)
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, size, offset)
+                if len(chunk) < size:
+                    # Truncated since the headers went out; Content-Length can't be honoured
+                    raise RuntimeError(f"{self.info.path} shrank during transfer")
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _listen_for_disconnect(receive: Receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
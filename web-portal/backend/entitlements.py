@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+import os
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache
+from models import UserSubscription
+
+load_dotenv()
+
+# Entitlement cache configuration. Webhooks invalidate only the worker that
+# processes them, so every other worker may serve a changed (e.g. cancelled)
+# plan for up to ENTITLEMENT_CACHE_TTL seconds; that is the staleness bound.
+# "No subscription" answers are cached for a shorter time so purchases show up
+# quickly.
+ENTITLEMENT_CACHE_TTL = float(os.getenv("ENTITLEMENT_CACHE_TTL", "30"))
+ENTITLEMENT_NEGATIVE_TTL = float(os.getenv("ENTITLEMENT_NEGATIVE_TTL", "10"))
+ENTITLEMENT_CACHE_SIZE = int(os.getenv("ENTITLEMENT_CACHE_SIZE", "10000"))
+
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class Entitlement:
+    """Snapshot of a user's active subscription"""
+
+    plan_type: str
+    status: str
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_subscription(cls, subscription: UserSubscription) -> "Entitlement":
+        return cls(
+            plan_type=subscription.plan_type,
+            status=subscription.status,
+            created_at=subscription.created_at,
+        )
+
+
+# user id -> Entitlement, or None for "no active subscription"
+entitlement_cache = TTLCache(maxsize=ENTITLEMENT_CACHE_SIZE, ttl=ENTITLEMENT_CACHE_TTL)
+
+
+async def get_active_entitlement(db: AsyncSession, user_id: int) -> Optional[Entitlement]:
+    """Return the user's active subscription, memoized per worker"""
+    cached = entitlement_cache.get(user_id, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    result = await db.execute(
+        select(UserSubscription).where(
+            UserSubscription.user_id == user_id,
+            UserSubscription.is_active == True
+        ).order_by(UserSubscription.created_at.desc()).limit(1)
+    )
+    subscription = result.scalars().first()
+    entitlement = Entitlement.from_subscription(subscription) if subscription is not None else None
+    cache_entitlement(user_id, entitlement)
+    return entitlement
+
+
+def cache_entitlement(user_id: int, entitlement: Optional[Entitlement]):
+    """Cache a freshly read entitlement, or its absence for the shorter negative TTL"""
+    if entitlement is None:
+        entitlement_cache.set(user_id, None, ttl=ENTITLEMENT_NEGATIVE_TTL)
+    else:
+        entitlement_cache.set(user_id, entitlement)
+
+
+def remember_entitlement(subscription: UserSubscription):
+    """Cache a subscription that was just committed"""
+    entitlement_cache.set(subscription.user_id, Entitlement.from_subscription(subscription))
+
+
+def invalidate_entitlement(user_id: int):
+    """Forget a user's cached entitlement after their subscriptions change"""
+    entitlement_cache.invalidate(user_id)
+
+
+def entitlement_stats() -> dict:
+    return entitlement_cache.stats()
@@ -0,0 +1,142 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+from metrics import PASSWORD_HASH_LATENCY, PASSWORD_HASH_QUEUE_WAIT
+
+load_dotenv()
+
+# Hashing pool configuration
+HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full and the request should be shed"""
+
+    def __init__(self, pending: int, limit: int):
+        super().__init__(f"Password hashing queue full ({pending}/{limit})")
+        self.pending = pending
+        self.limit = limit
+
+
+def _timed_call(fn: Callable, args: tuple) -> tuple:
+    """Run fn in the worker and report when it started and finished.
+
+    time.monotonic() is system-wide on Linux, so the timestamps are comparable
+    with the submitting process even when running in a process pool.
+    """
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started, time.monotonic()
+
+
+class _Timing:
+    """Running count/sum/max for one latency series"""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": (self.total / self.count * 1000) if self.count else 0.0,
+            "max_ms": self.max * 1000,
+        }
+
+
+class HashingService:
+    """Bounded worker pool for CPU-bound password hashing.
+
+    bcrypt releases the GIL, so a thread pool keeps the event loop responsive
+    without the pickling overhead of a process pool; the process pool is
+    available for hashers that do not.
+    """
+
+    def __init__(self, executor: str = HASH_EXECUTOR, workers: int = HASH_WORKERS,
+                 max_queue: int = HASH_MAX_QUEUE):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown PASSWORD_HASH_EXECUTOR: {executor}")
+        self.executor_type = executor
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self._hash_latency = _Timing()
+        self._queue_wait = _Timing()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.executor_type == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="pwhash"
+                        )
+        return self._executor
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """Run fn(*args) on the pool, shedding load once max_queue calls are in flight"""
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._rejected += 1
+                raise HashingOverloaded(self._pending, self.max_queue)
+            self._pending += 1
+        try:
+            submitted = time.monotonic()
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(
+                self._get_executor(), _timed_call, fn, args
+            )
+            queue_wait, hash_latency = max(0.0, started - submitted), finished - started
+            with self._lock:
+                self._queue_wait.observe(queue_wait)
+                self._hash_latency.observe(hash_latency)
+            PASSWORD_HASH_QUEUE_WAIT.observe(queue_wait)
+            PASSWORD_HASH_LATENCY.observe(hash_latency)
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> dict:
+        """Snapshot of pool configuration, queue depth and timing metrics"""
+        with self._lock:
+            return {
+                "executor": self.executor_type,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "rejected": self._rejected,
+                "hash_latency": self._hash_latency.as_dict(),
+                "queue_wait": self._queue_wait.as_dict(),
+            }
+
+    def shutdown(self):
+        """Stop the worker pool; it is recreated lazily on next use"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+password_hasher = HashingService()
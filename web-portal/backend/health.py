@@ -0,0 +1,105 @@
+from typing import Awaitable, Optional
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from database import AsyncSessionLocal, get_async_engine, pool_stats
+from webhooks import pending_event_stats, webhook_worker
+
+load_dotenv()
+
+# Readiness probe configuration. Results are cached so that frequent probing
+# by load balancers and orchestrators costs one round of checks per interval.
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "2"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+# Not ready once this fraction of pool_size + max_overflow is checked out
+HEALTH_POOL_SATURATION = float(os.getenv("HEALTH_POOL_SATURATION", "0.9"))
+# Not ready above this many pending Stripe events; 0 only reports the backlog.
+# The queue is shared, so a backlog takes every worker out of rotation at once.
+HEALTH_MAX_WEBHOOK_BACKLOG = int(os.getenv("HEALTH_MAX_WEBHOOK_BACKLOG", "0"))
+
+
+async def _with_timeout(probe: Awaitable[dict]) -> dict:
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(probe, timeout=HEALTH_PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        result = {"ok": False, "error": f"timed out after {HEALTH_PROBE_TIMEOUT}s"}
+    except Exception as e:
+        result = {"ok": False, "error": repr(e)}
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+async def probe_database() -> dict:
+    async with get_async_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return {"ok": True}
+
+
+def probe_pool() -> dict:
+    stats = pool_stats()["primary"]
+    if "size" not in stats:
+        # NullPool/StaticPool (SQLite) have no capacity to exhaust
+        return {"ok": True, "pool": stats["pool"]}
+    capacity = stats["size"] + stats["max_overflow"]
+    saturation = stats["checked_out"] / capacity if capacity else 0.0
+    return {
+        "ok": saturation < HEALTH_POOL_SATURATION,
+        "checked_out": stats["checked_out"],
+        "capacity": capacity,
+        "saturation": round(saturation, 3),
+    }
+
+
+async def probe_webhooks() -> dict:
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        stats = await pending_event_stats(db)
+    over_backlog = HEALTH_MAX_WEBHOOK_BACKLOG and stats["pending"] > HEALTH_MAX_WEBHOOK_BACKLOG
+    return {"ok": not over_backlog, "worker_running": webhook_worker.running, **stats}
+
+
+async def run_readiness_checks() -> dict:
+    pool = probe_pool()
+    database, webhooks = await asyncio.gather(_with_timeout(probe_database()), _with_timeout(probe_webhooks()))
+    checks = {"database": database, "pool": pool, "webhooks": webhooks}
+    return {
+        "ready": all(check["ok"] for check in checks.values()),
+        "checked_at": time.time(),
+        "checks": checks,
+    }
+
+
+class ReadinessCache:
+    """Serve the last readiness result for `ttl` seconds.
+
+    Concurrent probes arriving while the checks run wait for that run
+    instead of starting their own.
+    """
+
+    def __init__(self, ttl: float = HEALTH_CACHE_TTL):
+        self.ttl = ttl
+        self._result: Optional[dict] = None
+        self._expires = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._result is not None and time.monotonic() < self._expires
+
+    async def get(self) -> dict:
+        if self._fresh():
+            return self._result
+        async with self._lock:
+            if not self._fresh():
+                self._result = await run_readiness_checks()
+                self._expires = time.monotonic() + self.ttl
+            return self._result
+
+    def clear(self):
+        self._result = None
+        self._expires = 0.0
+
+
+readiness = ReadinessCache()
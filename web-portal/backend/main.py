@@ -1,49 +1,150 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Optional
 import stripe
+import hmac
 import os
+import json
 import logging
 from dotenv import load_dotenv
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
-from database import SessionLocal, engine, init_db
-from models import User, UserSubscription
-from schemas import UserCreate, UserLogin, UserResponse, TokenResponse, CheckoutRequest
+from database import (
+    get_db,
+    get_read_db,
+    has_replica,
+    init_db,
+    verify_schema,
+    dispose_engines,
+    pool_stats
+)
+from models import User, UserSubscription, normalize_email
+from schemas import (
+    UserCreate,
+    UserLogin,
+    UserResponse,
+    SubscriptionInfo,
+    TokenResponse,
+    RefreshRequest,
+    LogoutRequest,
+    CheckoutRequest
+)
 from auth import (
     create_access_token, 
-    verify_password, 
-    get_password_hash,
-    decode_access_token
+    verify_and_update_password_async,
+    get_password_hash_async,
+    decode_access_token,
+    JWT_EMBED_CLAIMS,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    token_cache
+)
+from hashing import HashingOverloaded, password_hasher
+from principals import UserPrincipal, load_principal, user_cache
+from entitlements import (
+    get_active_entitlement,
+    remember_entitlement,
+    entitlement_stats
+)
+from webhooks import enqueue_event, webhook_worker
+from refresh_tokens import (
+    InvalidRefreshToken,
+    RefreshTokenReused,
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token
+)
+from revocation import revocation_list
+from stripe_gateway import StripeGatewayError, stripe_gateway
+from rate_limit import limiter, check_account_limit
+from logging_config import setup_logging
+from health import readiness
+from metrics import MetricsMiddleware, RATE_LIMIT_REJECTIONS, render_metrics
+from profiling import ProfilingMiddleware
+from downloads import (
+    FileRangeResponse,
+    RangeNotSatisfiable,
+    app_binary_info,
+    app_binary_name,
+    download_slots,
+    etag_matches,
+    parse_range,
+    DOWNLOAD_RETRY_AFTER
 )
+from releases import release_catalog, RELEASE_DEFAULT_PLATFORM, RELEASE_MANIFEST_MAX_AGE
 
 load_dotenv()
 
-# Initialize database
-init_db()
+app = FastAPI(title="Legal Toolkit Web Portal", version="1.0.0", default_response_class=ORJSONResponse)
 
-app = FastAPI(title="Legal Toolkit Web Portal", version="1.0.0")
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (queued; formatting and disk writes happen off the event loop)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Rate limiting setup
-limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    RATE_LIMIT_REJECTIONS.labels("route").inc()
+    return _rate_limit_exceeded_handler(request, exc)
+
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloaded):
+    """Shed load when the password hashing queue is full"""
+    logger.warning("Password hashing queue full (%d/%d), rejecting %s", exc.pending, exc.limit,
+                   request.url.path, extra={"event": "hash_queue_full"})
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+# Schema handling at worker startup: "verify" refuses to start on an outdated
+# schema, "upgrade" applies migrations (single-process dev only), "off" skips.
+# Production runs `alembic upgrade head` once before starting workers.
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "verify")
+
+@app.on_event("startup")
+async def check_schema():
+    if SCHEMA_CHECK == "upgrade":
+        init_db()
+    elif SCHEMA_CHECK == "verify":
+        await verify_schema()
+
+@app.on_event("startup")
+async def start_webhook_worker():
+    webhook_worker.start()
+
+@app.on_event("startup")
+async def start_revocation_refresh():
+    revocation_list.start()
+
+@app.on_event("shutdown")
+async def stop_webhook_worker():
+    await webhook_worker.stop()
+
+@app.on_event("shutdown")
+async def stop_revocation_refresh():
+    await revocation_list.stop()
+
+@app.on_event("shutdown")
+async def close_stripe_gateway():
+    await stripe_gateway.aclose()
+
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_database():
+    await dispose_engines()
 
 # Configure CORS - Restricted for security
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001,http://localhost:5173").split(",")
@@ -54,6 +155,10 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "Accept", "Origin", "X-Requested-With"],
 )
+# Opt-in via PROFILE_SAMPLE_RATE / PROFILE_DEBUG_TOKEN; a pass-through otherwise
+app.add_middleware(ProfilingMiddleware)
+# Outermost, so latency includes CORS handling and preflights are counted
+app.add_middleware(MetricsMiddleware)
 
 # Stripe configuration
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
@@ -62,24 +167,58 @@ STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 # Security
 security = HTTPBearer()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Bearer token for operational endpoints that expose pool, cache and traffic
+# internals; unset, those endpoints answer 404
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "")
+internal_security = HTTPBearer(auto_error=False)
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    """Get current user from JWT token"""
-    token = credentials.credentials
-    payload = decode_access_token(token)
+def require_internal_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(internal_security)):
+    """Admit only callers presenting INTERNAL_API_TOKEN (monitoring, operators)"""
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), INTERNAL_API_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid internal API token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+async def get_token_payload(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> dict:
+    """Verified, unrevoked JWT claims of the request's bearer token"""
+    payload = decode_access_token(credentials.credentials)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Download tokens travel in URLs; they only unlock /download/app/file
+    if payload.get("type") == "download":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
+    # Bloom filter first: tokens that were never revoked cost no query
+    jti = payload.get("jti")
+    if jti and await revocation_list.is_revoked(db, jti):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+async def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    read_db: AsyncSession = Depends(get_read_db),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get current user from JWT token"""
     user_id = payload.get("sub")
     if user_id is None:
         raise HTTPException(
@@ -88,62 +227,131 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
+            detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
+    principal = user_cache.get(user_id)
+    if principal is None and JWT_EMBED_CLAIMS:
+        principal = UserPrincipal.from_claims(user_id, payload)
+    if principal is None:
+        principal = await load_principal(read_db, user_id)
+        if principal is None and has_replica():
+            # Freshly registered users may not have replicated yet
+            principal = await load_principal(db, user_id)
+        if principal is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        user_cache.set(user_id, principal)
+    
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    
+    return principal
+
+async def issue_tokens(db: AsyncSession, db_user: User, refresh_token: Optional[str] = None) -> TokenResponse:
+    """Access token for db_user, plus a new refresh token unless one is given"""
+    token_data = {"sub": str(db_user.id)}
+    if JWT_EMBED_CLAIMS:
+        entitlement = await get_active_entitlement(db, db_user.id)
+        token_data.update({
+            "email": db_user.email,
+            "active": db_user.is_active,
+            "plan": entitlement.plan_type if entitlement else None
+        })
+    if refresh_token is None:
+        refresh_token = issue_refresh_token(db, db_user.id)
+        await db.commit()
+    return TokenResponse(
+        access_token=create_access_token(data=token_data),
+        token_type="bearer",
+        refresh_token=refresh_token,
+        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
+
+def _registration_duplicate(email: str):
+    logger.warning("Registration failed - email already exists: %s", email,
+                   extra={"event": "register_duplicate"})
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Email already registered"
+    )
 
 @app.post("/auth/register", response_model=UserResponse)
 @limiter.limit("3/minute")  # 3 registration attempts per minute
-async def register(request: Request, user: UserCreate, db: Session = Depends(get_db)):
+async def register(request: Request, user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
-    logger.info(f"Registration attempt for email: {user.email}")
+    logger.info("Registration attempt for email: %s", user.email, extra={"event": "register_attempt"})
     
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user.email).first()
-    if existing_user:
-        logger.warning(f"Registration failed - email already exists: {user.email}")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
+    # Indexed lookup first, so a duplicate (or hostile) registration is refused
+    # before it costs a bcrypt hash and a hashing-pool slot
+    email_normalized = normalize_email(user.email)
+    taken = await db.scalar(select(User.id).where(User.email_normalized == email_normalized))
+    if taken is not None:
+        _registration_duplicate(user.email)
+
+    # The unique index on email_normalized settles concurrent registrations
+    # that all passed the lookup: exactly one insert returns a row
+    hashed_password = await get_password_hash_async(user.password)
+    created_at = datetime.utcnow()
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    result = await db.execute(
+        insert(User)
+        .values(
+            email=user.email,
+            email_normalized=email_normalized,
+            hashed_password=hashed_password,
+            full_name=user.full_name,
+            is_active=True,
+            created_at=created_at
         )
-    
-    # Create new user
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        email=user.email,
-        hashed_password=hashed_password,
-        full_name=user.full_name,
-        is_active=True
+        .on_conflict_do_nothing()
+        .returning(User.id)
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    user_id = result.scalar()
+    await db.commit()
+    if user_id is None:
+        _registration_duplicate(user.email)
     
-    logger.info(f"User registered successfully: {user.email} (ID: {db_user.id})")
+    logger.info("User registered successfully: %s (ID: %d)", user.email, user_id,
+                extra={"event": "register_success", "user_id": user_id})
     
     return UserResponse(
-        id=db_user.id,
-        email=db_user.email,
-        full_name=db_user.full_name,
-        is_active=db_user.is_active,
-        created_at=db_user.created_at
+        id=user_id,
+        email=user.email,
+        full_name=user.full_name,
+        is_active=True,
+        created_at=created_at
     )
 
 @app.post("/auth/login", response_model=TokenResponse)
 @limiter.limit("5/minute")  # 5 login attempts per minute
-async def login(request: Request, user: UserLogin, db: Session = Depends(get_db)):
+async def login(request: Request, user: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login user and return JWT token"""
-    logger.info(f"Login attempt for email: {user.email}")
+    logger.info("Login attempt for email: %s", user.email, extra={"event": "login_attempt"})
+    
+    # Per-account budget on top of the per-IP limit, checked before any bcrypt work
+    email = normalize_email(user.email)
+    check_account_limit("login-account", email)
     
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
-        logger.warning(f"Failed login attempt for email: {user.email}")
+    result = await db.execute(select(User).where(User.email_normalized == email))
+    db_user = result.scalars().first()
+    valid, new_hash = (False, None)
+    if db_user:
+        valid, new_hash = await verify_and_update_password_async(user.password, db_user.hashed_password)
+    if not valid:
+        logger.warning("Failed login attempt for email: %s", user.email, extra={"event": "login_failed"})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -156,40 +364,93 @@ async def login(request: Request, user: UserLogin, db: Session = Depends(get_db)
             detail="Inactive user"
         )
     
-    access_token = create_access_token(data={"sub": str(db_user.id)})
-    logger.info(f"Successful login for email: {user.email} (ID: {db_user.id})")
-    return TokenResponse(access_token=access_token, token_type="bearer")
+    if new_hash:
+        # Stored hash uses an outdated scheme or cost; replace it while we have the password
+        db_user.hashed_password = new_hash  # committed with the refresh token below
+        logger.info("Rehashed password for user %d", db_user.id, extra={"event": "password_rehash"})
+    
+    response = await issue_tokens(db, db_user)
+    logger.info("Successful login for email: %s (ID: %d)", user.email, db_user.id,
+                extra={"event": "login_success", "user_id": db_user.id})
+    return response
+
+@app.post("/auth/refresh", response_model=TokenResponse)
+@limiter.limit("30/minute")
+async def refresh(request: Request, body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    try:
+        user_id, refresh_token = await rotate_refresh_token(db, body.refresh_token)
+    except RefreshTokenReused as e:
+        logger.warning("Refresh token reuse for user %d; revoked its session", e.user_id,
+                       extra={"event": "refresh_reuse", "user_id": e.user_id})
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    except InvalidRefreshToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    db_user = await db.get(User, user_id)
+    if db_user is None or not db_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await issue_tokens(db, db_user, refresh_token=refresh_token)
+
+@app.post("/auth/logout")
+async def logout(
+    body: Optional[LogoutRequest] = None,
+    payload: dict = Depends(get_token_payload),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Revoke the presented access token and, if given, its refresh token session"""
+    if payload.get("jti"):
+        await revocation_list.revoke(db, payload["jti"], current_user.id,
+                                     datetime.utcfromtimestamp(payload["exp"]))
+    if body is not None and body.refresh_token:
+        await revoke_refresh_token(db, body.refresh_token, current_user.id)
+    await db.commit()
+    logger.info("User %d logged out", current_user.id, extra={"event": "logout", "user_id": current_user.id})
+    return {"status": "logged_out"}
 
 @app.post("/payment/create-checkout")
 async def create_checkout_session(
     request: CheckoutRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Create Stripe checkout session"""
-    try:
-        # Define price mapping
-        prices = {
-            "one_time": {
-                "price": 2900,  # $29.00 in cents
-                "mode": "payment"
-            },
-            "monthly": {
-                "price": 900,   # $9.00 in cents
-                "mode": "subscription"
-            }
+    # Define price mapping
+    prices = {
+        "one_time": {
+            "price": 2900,  # $29.00 in cents
+            "mode": "payment"
+        },
+        "monthly": {
+            "price": 900,   # $9.00 in cents
+            "mode": "subscription"
         }
-        
-        if request.plan_type not in prices:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid plan type"
-            )
-        
-        plan = prices[request.plan_type]
-        
-        # Create Stripe checkout session
-        checkout_session = stripe.checkout.Session.create(
+    }
+    
+    if request.plan_type not in prices:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid plan type"
+        )
+    
+    plan = prices[request.plan_type]
+    
+    try:
+        # Create Stripe checkout session without blocking the event loop
+        checkout_session = await stripe_gateway.create_checkout_session(
             payment_method_types=['card'],
             line_items=[{
                 'price_data': {
@@ -210,23 +471,33 @@ async def create_checkout_session(
                 'plan_type': request.plan_type
             }
         )
-        
-        return {"checkout_url": checkout_session.url}
-        
-    except Exception as e:
+    except StripeGatewayError as e:
+        logger.error("Stripe checkout session creation failed: %s", e, extra={"event": "checkout_failed"})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create checkout session: {str(e)}"
         )
+    
+    return {"checkout_url": checkout_session["url"]}
 
 @app.get("/download/app")
-async def download_app(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    """Download app with auth token (requires active subscription)"""
-    # Check if user has active subscription
-    subscription = db.query(UserSubscription).filter(
-        UserSubscription.user_id == current_user.id,
-        UserSubscription.is_active == True
-    ).first()
+async def download_app(
+    platform: Optional[str] = None,
+    version: Optional[str] = None,
+    from_version: Optional[str] = None,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Download app with auth token (requires active subscription)
+
+    Serves the latest release for the platform unless a version is given.
+    Clients that send their installed from_version get a patch when one is
+    published and smaller than the installer.
+    """
+    # Check if user has active subscription (trusting the token's plan claim if embedded)
+    subscription = current_user.plan
+    if subscription is None:
+        subscription = await get_active_entitlement(db, current_user.id)
     
     # Check if we're in Stripe test mode (using test keys)
     stripe_secret_key = os.getenv("STRIPE_SECRET_KEY", "")
@@ -234,17 +505,29 @@ async def download_app(current_user: User = Depends(get_current_user), db: Sessi
     
     if not subscription:
         if is_stripe_test_mode:
-            logger.info(f"Stripe test mode: Creating test subscription for user {current_user.id}")
-            # In test mode, create a test subscription for development workflow
-            subscription = UserSubscription(
-                user_id=current_user.id,
-                plan_type="test_subscription",
-                is_active=True,
-                stripe_subscription_id="test_sub_" + str(current_user.id),
-                created_at=datetime.utcnow()
+            logger.info("Stripe test mode: Creating test subscription for user %d", current_user.id)
+            # In test mode, create a test subscription for development workflow,
+            # reactivating the user's earlier one (stripe_subscription_id is unique)
+            values = {
+                "user_id": current_user.id,
+                "plan_type": "test_subscription",
+                "status": "active",
+                "is_active": True,
+                "stripe_subscription_id": "test_sub_" + str(current_user.id),
+                "created_at": datetime.utcnow(),
+            }
+            insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+            stmt = insert(UserSubscription).values(**values)
+            result = await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["stripe_subscription_id"],
+                    set_={"plan_type": stmt.excluded.plan_type, "status": stmt.excluded.status,
+                          "is_active": True, "expires_at": None}
+                ).returning(UserSubscription)
             )
-            db.add(subscription)
-            db.commit()
+            subscription = result.scalars().one()
+            await db.commit()
+            remember_entitlement(subscription)
         else:
             # Production mode: Strict subscription check
             raise HTTPException(
@@ -252,77 +535,175 @@ async def download_app(current_user: User = Depends(get_current_user), db: Sessi
                 detail="Active subscription required to download app"
             )
     
+    # Without a release catalog, fall back to the single APP_DOWNLOAD_PATH binary
+    release_catalog.reload_if_changed()
+    token_data = {"sub": str(current_user.id), "type": "download"}
+    release = artifact = None
+    if release_catalog:
+        release = release_catalog.get(platform or RELEASE_DEFAULT_PLATFORM, version)
+        if release is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No release available for this platform and version"
+            )
+        artifact = release_catalog.best_download(release, from_version)
+        token_data["sha"] = artifact.sha256
+    
     # Generate download token valid for 1 hour
     download_token = create_access_token(
-        data={"sub": str(current_user.id), "type": "download"},
+        data=token_data,
         expires_delta=timedelta(hours=1)
     )
     
-    return {
+    response = {
         "download_token": download_token,
         "download_url": f"/download/app/file?token={download_token}",
         "expires_at": datetime.utcnow() + timedelta(hours=1)
     }
+    if release is not None:
+        response.update(
+            version=release.version,
+            platform=release.platform,
+            filename=artifact.filename,
+            sha256=artifact.sha256,
+            size=artifact.size,
+            # Set when the download is a patch to apply to the from_version install
+            patch_from=artifact.from_version if artifact is not release else None
+        )
+    return response
+
+@app.get("/download/app/manifest")
+async def download_manifest(request: Request):
+    """Latest release per platform, for update checks (supports If-None-Match)"""
+    release_catalog.reload_if_changed()
+    headers = {
+        "ETag": release_catalog.manifest_etag,
+        "Cache-Control": f"public, max-age={RELEASE_MANIFEST_MAX_AGE}",
+    }
+    if etag_matches(request.headers.get("if-none-match"), release_catalog.manifest_etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=release_catalog.manifest, media_type="application/json", headers=headers)
+
+@app.api_route("/download/app/file", methods=["GET", "HEAD"])
+async def download_app_file(request: Request, token: str, db: AsyncSession = Depends(get_db)):
+    """Serve the app binary for a download token, with Range and ETag support"""
+    payload = decode_access_token(token)
+    if payload is None or payload.get("type") != "download":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid download token"
+        )
+    jti = payload.get("jti")
+    revoked = jti is not None and await revocation_list.is_revoked(db, jti)
+    # The session would otherwise stay open until the transfer finishes
+    await db.close()
+    if revoked:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid download token"
+        )
+    
+    sha = payload.get("sha")
+    if sha is not None:
+        release_catalog.reload_if_changed()
+        artifact = release_catalog.artifact(sha)
+        if artifact is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Release no longer available"
+            )
+        info, filename = artifact
+    else:
+        try:
+            info = await app_binary_info()
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="App binary not available"
+            )
+        filename = app_binary_name()
+    
+    headers = {
+        "ETag": info.etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-transform",
+    }
+    if etag_matches(request.headers.get("if-none-match"), info.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != info.etag:
+        range_header = None  # the client's partial copy is stale; send it all
+    try:
+        byte_range = parse_range(range_header, info.size)
+    except RangeNotSatisfiable:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{info.size}"}
+        )
+    
+    if not download_slots.try_acquire():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many downloads in progress",
+            headers={"Retry-After": str(DOWNLOAD_RETRY_AFTER)}
+        )
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return FileRangeResponse(
+        info,
+        byte_range,
+        headers=headers,
+        send_body=request.method != "HEAD",
+        on_close=download_slots.release
+    )
 
 @app.get("/user/profile", response_model=UserResponse)
-async def get_user_profile(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_user_profile(current_user: UserPrincipal = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
     """Get current user profile"""
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
     # Get subscription info
-    subscription = db.query(UserSubscription).filter(
-        UserSubscription.user_id == current_user.id,
-        UserSubscription.is_active == True
-    ).first()
-    
-    response = UserResponse(
-        id=current_user.id,
-        email=current_user.email,
-        full_name=current_user.full_name,
-        is_active=current_user.is_active,
-        created_at=current_user.created_at
-    )
+    subscription = await get_active_entitlement(db, current_user.id)
     
+    response = UserResponse.model_validate(user)
     if subscription:
-        response.subscription = {
-            "plan_type": subscription.plan_type,
-            "status": subscription.status,
-            "created_at": subscription.created_at
-        }
-    
+        response.subscription = SubscriptionInfo.model_validate(subscription)
     return response
 
 @app.post("/webhook/stripe")
 @limiter.limit("100/minute")  # High limit for legitimate webhook traffic
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
-    """Handle Stripe webhooks"""
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_db)):
+    """Queue verified Stripe webhook events for background processing"""
     payload = await request.body()
     sig_header = request.headers.get('stripe-signature')
     
+    if not sig_header:
+        raise HTTPException(status_code=400, detail="Invalid signature")
+    
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, STRIPE_WEBHOOK_SECRET
+        # Verify and parse without building a StripeObject: the plain dict is
+        # what gets queued (and construct_event is broken in stripe 7.8)
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"), sig_header, STRIPE_WEBHOOK_SECRET, stripe.Webhook.DEFAULT_TOLERANCE
         )
+        event = json.loads(payload)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid payload")
     except stripe.error.SignatureVerificationError:
         raise HTTPException(status_code=400, detail="Invalid signature")
     
-    # Handle the event
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        user_id = session['metadata']['user_id']
-        plan_type = session['metadata']['plan_type']
-        
-        # Create or update subscription
-        subscription = UserSubscription(
-            user_id=user_id,
-            plan_type=plan_type,
-            stripe_customer_id=session.get('customer'),
-            stripe_subscription_id=session.get('subscription'),
-            status='active',
-            is_active=True
-        )
-        db.add(subscription)
-        db.commit()
+    # Persist and ack immediately; the webhook worker applies it idempotently
+    if await enqueue_event(db, event, payload):
+        webhook_worker.notify()
+    else:
+        logger.info("Duplicate Stripe event ignored: %s", event["id"], extra={"event": "webhook_duplicate"})
     
     return {"status": "success"}
 
@@ -331,6 +712,41 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is serving requests; touches no dependencies"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: database reachable, pool not saturated, webhook backlog bounded"""
+    result = await readiness.get()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if result["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ready" if result["ready"] else "not_ready", **result},
+    )
+
+@app.get("/health/pool", dependencies=[Depends(require_internal_token)])
+async def health_pool():
+    """Connection pool statistics for the worker serving this request"""
+    return pool_stats()
+
+@app.get("/health/caches", dependencies=[Depends(require_internal_token)])
+async def health_caches():
+    """Hit/miss counters for the per-worker caches"""
+    return {
+        "users": user_cache.stats(),
+        "entitlements": entitlement_stats(),
+        "revocations": revocation_list.stats(),
+        "tokens": token_cache.stats()
+    }
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_internal_token)])
+def metrics():
+    """Prometheus exposition of request, database, hashing and webhook metrics"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
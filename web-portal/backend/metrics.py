@@ -0,0 +1,136 @@
+from typing import Tuple
+import os
+import time
+from dotenv import load_dotenv
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+# With several uvicorn/gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an
+# empty directory shared by the workers so /metrics aggregates all of them
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Routes excluded from request metrics (scrapes and probes would dominate them)
+METRICS_EXCLUDE_PATHS = set(filter(None, os.getenv("METRICS_EXCLUDE_PATHS", "/metrics,/health/live,/health/ready").split(",")))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+LAG_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 1800.0, 3600.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to produce the response, by route template",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests currently being handled",
+    multiprocess_mode="livesum",
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Database statement execution time, by statement type",
+    ["operation"], buckets=DB_BUCKETS,
+)
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds", "Time spent in bcrypt on the hashing pool",
+    buckets=HASH_BUCKETS,
+)
+PASSWORD_HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds", "Time hashing calls waited for a pool worker",
+    buckets=HASH_BUCKETS,
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total", "Requests rejected with 429, by limit scope",
+    ["scope"],
+)
+WEBHOOK_LAG = Histogram(
+    "webhook_processing_lag_seconds", "Time from receiving a Stripe event to applying it",
+    ["type"], buckets=LAG_BUCKETS,
+)
+WEBHOOK_EVENTS = Counter(
+    "webhook_events_processed_total", "Stripe events processed by the queue worker",
+    ["result"],
+)
+DOWNLOADS_IN_PROGRESS = Gauge(
+    "downloads_in_progress", "App binary transfers currently streaming",
+    multiprocess_mode="livesum",
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition body and content type for the /metrics endpoint"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request counts and latency per route.
+
+    Requests are labelled with the route template ("/user/{id}", not the raw
+    path) so cardinality stays bounded; unmatched paths share one label.
+    Avoids BaseHTTPMiddleware, which adds a task and body copy per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in METRICS_EXCLUDE_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            # The router stores the matched route in the scope it was given
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_LATENCY.labels(method, template).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, template, str(status_code)).inc()
+
+
+def _operation(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[:1]
+    return verb[0].upper() if verb else "UNKNOWN"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_start", None)
+    if started is None:
+        return
+    DB_QUERY_LATENCY.labels(_operation(statement)).observe(time.perf_counter() - started)
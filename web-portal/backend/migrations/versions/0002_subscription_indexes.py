@@ -0,0 +1,46 @@
+"""Index active-subscription lookups and Stripe subscription ids
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Retried Stripe webhooks used to insert the same subscription more than
+    # once. The copies may disagree (one cancelled, one active), so which row
+    # to keep is left to the operator rather than guessed.
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT stripe_subscription_id, COUNT(*) FROM user_subscriptions "
+        "WHERE stripe_subscription_id IS NOT NULL "
+        "GROUP BY stripe_subscription_id HAVING COUNT(*) > 1 ORDER BY stripe_subscription_id"
+    )).all()
+    if duplicates:
+        listing = ", ".join(f"{subscription_id} ({count} rows)" for subscription_id, count in duplicates[:20])
+        raise RuntimeError(
+            f"{len(duplicates)} Stripe subscription(s) are recorded more than once: {listing}; "
+            f"delete the stale rows in user_subscriptions and rerun the migration"
+        )
+    op.create_index(
+        "ix_user_subscriptions_user_id_is_active",
+        "user_subscriptions",
+        ["user_id", "is_active"],
+    )
+    op.create_index(
+        "uq_user_subscriptions_stripe_subscription_id",
+        "user_subscriptions",
+        ["stripe_subscription_id"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_user_subscriptions_stripe_subscription_id", table_name="user_subscriptions")
+    op.drop_index("ix_user_subscriptions_user_id_is_active", table_name="user_subscriptions")
@@ -0,0 +1,50 @@
+"""Case-normalized email column for registration and login
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from models import normalize_email
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users", sa.Column("email_normalized", sa.String(), nullable=True))
+    # Backfill with the app's own normalize_email: SQL lower()/trim() disagree
+    # with str.lower()/strip() on non-ASCII letters and non-space whitespace
+    users = sa.table("users", sa.column("id", sa.Integer()), sa.column("email", sa.String()),
+                     sa.column("email_normalized", sa.String()))
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(users.c.id, users.c.email)).all()
+    if rows:
+        bind.execute(
+            users.update()
+            .where(users.c.id == sa.bindparam("user_id"))
+            .values(email_normalized=sa.bindparam("normalized")),
+            [{"user_id": user_id, "normalized": normalize_email(email)} for user_id, email in rows],
+        )
+    # Accounts that differ only by case can't be merged automatically
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT email_normalized FROM users GROUP BY email_normalized HAVING COUNT(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"{len(duplicates)} email address(es) are registered more than once with different case, "
+            f"e.g. {duplicates[0]!r}; merge or rename those accounts and rerun the migration"
+        )
+    with op.batch_alter_table("users") as batch:
+        batch.alter_column("email_normalized", existing_type=sa.String(), nullable=False)
+    op.create_index("uq_users_email_normalized", "users", ["email_normalized"], unique=True)
+
+
+def downgrade():
+    op.drop_index("uq_users_email_normalized", table_name="users")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("email_normalized")
@@ -0,0 +1,22 @@
+"""Retry backoff for queued Stripe webhook events
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("stripe_events", sa.Column("next_attempt_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("stripe_events") as batch:
+        batch.drop_column("next_attempt_at")
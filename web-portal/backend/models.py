@@ -1,15 +1,23 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
-Base = declarative_base()
+from database import Base
+
+def normalize_email(email: str) -> str:
+    """Form used for uniqueness and lookups: Foo@Example.com and foo@example.com are one account"""
+    return email.strip().lower()
+
+def _email_normalized_default(context) -> str:
+    return normalize_email(context.get_current_parameters()["email"])
 
 class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
+    # Registration conflicts and login lookups go through this column
+    email_normalized = Column(String, nullable=False, default=_email_normalized_default)
     hashed_password = Column(String, nullable=False)
     full_name = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
@@ -17,6 +25,10 @@ class User(Base):
     
     # Relationship to subscriptions
     subscriptions = relationship("UserSubscription", back_populates="user")
+    
+    __table_args__ = (
+        Index("uq_users_email_normalized", "email_normalized", unique=True),
+    )
 
 class UserSubscription(Base):
     __tablename__ = "user_subscriptions"
@@ -32,4 +44,56 @@ class UserSubscription(Base):
     expires_at = Column(DateTime, nullable=True)
     
     # Relationship to user
-    user = relationship("User", back_populates="subscriptions")
\ No newline at end of file
+    user = relationship("User", back_populates="subscriptions")
+    
+    __table_args__ = (
+        # Hot path: active subscription lookup per user (also serves the FK)
+        Index("ix_user_subscriptions_user_id_is_active", "user_id", "is_active"),
+        # Stripe webhooks look subscriptions up by their Stripe id; NULLs
+        # (one-time payments) are allowed to repeat
+        Index("uq_user_subscriptions_stripe_subscription_id", "stripe_subscription_id", unique=True),
+    )
+
+class StripeEvent(Base):
+    """Verified Stripe webhook event awaiting (or done with) processing"""
+    __tablename__ = "stripe_events"
+    
+    id = Column(String, primary_key=True)  # Stripe event id, e.g. "evt_..."
+    type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # raw verified JSON body
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)  # set after a failed attempt
+    
+    __table_args__ = (
+        # The worker only ever scans unprocessed events
+        Index(
+            "ix_stripe_events_pending",
+            "received_at",
+            postgresql_where=processed_at.is_(None),
+            sqlite_where=processed_at.is_(None),
+        ),
+    )
+
+class RefreshToken(Base):
+    """Long-lived refresh token, stored only as an HMAC digest"""
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True, index=True)
+    family_id = Column(String(32), nullable=False, index=True)  # shared by a chain of rotations
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+
+class RevokedToken(Base):
+    """Access token id revoked before its expiry (logout)"""
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)  # prunable after the token's exp
@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import Optional
+import os
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import TTLCache
+from entitlements import Entitlement, cache_entitlement
+from models import User, UserSubscription
+
+load_dotenv()
+
+# User principal cache configuration
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True, slots=True)
+class UserPrincipal:
+    """The authenticated identity handed to routes by get_current_user.
+
+    The subscription is deliberately not a field: principals live in
+    user_cache, which webhooks don't invalidate, so routes read it through
+    get_active_entitlement (primed by load_principal) instead.
+    """
+
+    id: int
+    email: str
+    is_active: bool
+    plan: Optional[str] = None  # only set from embedded token claims
+
+    @classmethod
+    def from_claims(cls, user_id: int, payload: dict) -> Optional["UserPrincipal"]:
+        """Build a principal from claims embedded by create_access_token, if present"""
+        if "email" not in payload or "active" not in payload:
+            return None
+        return cls(
+            id=user_id,
+            email=payload["email"],
+            is_active=bool(payload["active"]),
+            plan=payload.get("plan"),
+        )
+
+
+_users = User.__table__
+_subscriptions = UserSubscription.__table__
+
+# Built once; per request only the bound id changes, so SQLAlchemy serves the
+# compiled SQL from its cache. The outer join fetches the newest active
+# subscription in the same round trip (served by ix_user_subscriptions_user_id_is_active).
+PRINCIPAL_QUERY = (
+    select(
+        _users.c.id,
+        _users.c.email,
+        _users.c.is_active,
+        _subscriptions.c.plan_type,
+        _subscriptions.c.status,
+        _subscriptions.c.created_at,
+    )
+    .select_from(_users.outerjoin(
+        _subscriptions,
+        (_subscriptions.c.user_id == _users.c.id) & (_subscriptions.c.is_active == True),
+    ))
+    .where(_users.c.id == bindparam("user_id"))
+    .order_by(_subscriptions.c.created_at.desc())
+    .limit(1)
+)
+
+
+async def load_principal(db: AsyncSession, user_id: int) -> Optional[UserPrincipal]:
+    """Look a principal up without loading ORM objects; primes the entitlement cache"""
+    row = (await db.execute(PRINCIPAL_QUERY, {"user_id": user_id})).first()
+    if row is None:
+        return None
+    id_, email, is_active, plan_type, status, created_at = row
+    if plan_type is not None:
+        # Only cache a hit: a lagging replica may not have the subscription yet,
+        # and a cached absence would refuse downloads until it expired
+        cache_entitlement(id_, Entitlement(plan_type, status, created_at))
+    return UserPrincipal(id=id_, email=email, is_active=bool(is_active))
+
+
+# user id -> UserPrincipal
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(user_id: int):
+    """Drop a user's cached principal (deactivation, profile change, deletion)"""
+    user_cache.invalidate(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    # ORM flushes only; bulk update()/delete() statements must call invalidate_user
+    invalidate_user(target.id)
@@ -0,0 +1,300 @@
+"""Sampled, request-scoped profiling.
+
+A profiled request is observed by a sampler thread that, every
+PROFILE_INTERVAL seconds, records the request's current call stack: the live
+stack when its task is running on the event loop, or the chain of awaiting
+coroutines when it is suspended (waiting on the database, the hashing pool or
+Stripe). The samples are wall-clock, so time spent waiting shows up under the
+frame that awaited. SQL statements executed by the request are recorded with
+their durations.
+
+Output, under PROFILE_OUTPUT_DIR:
+  <METHOD>_<route>.folded   collapsed stacks appended per profiled request, for
+                            flamegraph.pl, speedscope or inferno
+  requests/<id>.json        per-request summary with its stacks and SQL
+
+A .folded file is rotated to .folded.1 once it passes PROFILE_MAX_FOLDED_BYTES,
+and only the newest PROFILE_MAX_REQUESTS summaries are kept.
+"""
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import asyncio
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Profiling configuration; with a zero sample rate and no debug token the
+# middleware passes every request straight through
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Requests carrying `X-Debug-Profile: <token>` are always profiled
+PROFILE_DEBUG_TOKEN = os.getenv("PROFILE_DEBUG_TOKEN", "")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "profiles")
+PROFILE_MAX_QUERIES = int(os.getenv("PROFILE_MAX_QUERIES", "200"))
+# Disk caps for the output above; 0 disables a cap
+PROFILE_MAX_REQUESTS = int(os.getenv("PROFILE_MAX_REQUESTS", "500"))
+PROFILE_MAX_FOLDED_BYTES = int(os.getenv("PROFILE_MAX_FOLDED_BYTES", str(10 * 1024 * 1024)))
+
+DEBUG_HEADER = b"x-debug-profile"
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _awaited_frames(coro) -> List:
+    """Frames of a suspended coroutine and everything it is awaiting, outermost first"""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+class RequestProfile:
+    """Stack samples and SQL statements collected for one request"""
+
+    def __init__(self, method: str, path: str, reason: str, root_frame, task: Optional[asyncio.Task],
+                 thread_id: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.root_frame = root_frame
+        self.task = task
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.stacks: Counter = Counter()
+        self._stacks_lock = threading.Lock()
+        self.queries: List[dict] = []
+        self.dropped_queries = 0
+
+    def sample(self, frames: Dict[int, object]):
+        """Record where the request is right now (called from the sampler thread)"""
+        stack = []
+        frame = frames.get(self.thread_id)
+        while frame is not None:
+            stack.append(frame)
+            if frame is self.root_frame:
+                break
+            frame = frame.f_back
+        if frame is self.root_frame:
+            stack.reverse()
+            labels = [_frame_label(f) for f in stack]
+        else:
+            # Not on the loop thread right now: report what it is awaiting
+            awaited = _awaited_frames(self.task.get_coro()) if self.task is not None else []
+            if self.root_frame not in awaited:
+                # Finished between ticks, or awaiting through a non-coroutine wrapper
+                return
+            awaited = awaited[awaited.index(self.root_frame):]
+            labels = [_frame_label(f) for f in awaited] + ["[await]"]
+        with self._stacks_lock:
+            self.stacks[";".join(labels)] += 1
+
+    def record_query(self, statement: str, duration: float):
+        if len(self.queries) >= PROFILE_MAX_QUERIES:
+            self.dropped_queries += 1
+            return
+        self.queries.append({"statement": statement, "duration_ms": round(duration * 1000, 3)})
+
+    def summary(self, route: str, status_code: int) -> dict:
+        with self._stacks_lock:
+            stacks = self.stacks.most_common()
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": route,
+            "status": status_code,
+            "reason": self.reason,
+            "duration_ms": round(self.duration * 1000, 3),
+            "interval_ms": PROFILE_INTERVAL * 1000,
+            "samples": sum(count for _, count in stacks),
+            "stacks": [f"{stack} {count}" for stack, count in stacks],
+            "queries": self.queries,
+            "dropped_queries": self.dropped_queries,
+        }
+
+
+class Sampler:
+    """Single background thread sampling every active RequestProfile"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self._active: Dict[str, RequestProfile] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: RequestProfile):
+        """Stop sampling a profile; waits for an in-flight tick to finish"""
+        with self._lock:
+            self._active.pop(profile.id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            # Sample under the lock so no tick touches a profile after remove()
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                for profile in self._active.values():
+                    try:
+                        profile.sample(frames)
+                    except Exception:
+                        # The request may finish mid-walk; skip this tick
+                        pass
+                del frames
+
+
+sampler = Sampler()
+
+
+def _route_slug(method: str, route: str) -> str:
+    return f"{method}_{re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'}"
+
+
+def _rotate(path: str, max_bytes: int):
+    """Move a file aside to <path>.1 (replacing the previous one) once it is too big"""
+    try:
+        if max_bytes and os.path.getsize(path) >= max_bytes:
+            os.replace(path, f"{path}.1")
+    except FileNotFoundError:
+        pass
+
+
+def _prune(directory: str, keep: int):
+    """Delete all but the newest `keep` files in a directory"""
+    if not keep:
+        return
+    entries = []
+    for entry in os.scandir(directory):
+        try:
+            entries.append((entry.stat().st_mtime_ns, entry.path))
+        except FileNotFoundError:
+            pass  # another worker pruned it
+    entries.sort(reverse=True)
+    for _, path in entries[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def write_profile(profile: RequestProfile, route: str, status_code: int, output_dir: Optional[str] = None):
+    """Append collapsed stacks for the route and write the per-request summary"""
+    output_dir = output_dir or PROFILE_OUTPUT_DIR
+    requests_dir = os.path.join(output_dir, "requests")
+    os.makedirs(requests_dir, exist_ok=True)
+    summary = profile.summary(route, status_code)
+    folded = os.path.join(output_dir, f"{_route_slug(profile.method, route)}.folded")
+    _rotate(folded, PROFILE_MAX_FOLDED_BYTES)
+    with open(folded, "a") as f:
+        f.writelines(f"{line}\n" for line in summary["stacks"])
+    with open(os.path.join(requests_dir, f"{profile.id}.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    _prune(requests_dir, PROFILE_MAX_REQUESTS)
+
+
+def _profile_reason(scope) -> Optional[str]:
+    if PROFILE_DEBUG_TOKEN:
+        for name, value in scope["headers"]:
+            if name == DEBUG_HEADER:
+                if hmac.compare_digest(value, PROFILE_DEBUG_TOKEN.encode()):
+                    return "debug_header"
+                break
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling a sampled fraction of requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILE_SAMPLE_RATE or PROFILE_DEBUG_TOKEN):
+            await self.app(scope, receive, send)
+            return
+        reason = _profile_reason(scope)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            scope["method"], scope["path"], reason,
+            root_frame=sys._getframe(),
+            task=asyncio.current_task(),
+            thread_id=threading.get_ident(),
+        )
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        token = _current_profile.set(profile)
+        sampler.add(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.remove(profile)
+            _current_profile.reset(token)
+            profile.duration = time.perf_counter() - profile.started
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            try:
+                # The response has been sent; keep file I/O off the event loop
+                await asyncio.to_thread(write_profile, profile, route, status_code)
+            except Exception:
+                # Profiling must never fail the request it observed
+                logger.exception("Could not write profile %s", profile.id)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info["profile_query_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("profile_query_start", None)
+    profile = _current_profile.get()
+    if started is not None and profile is not None:
+        profile.record_query(statement, time.perf_counter() - started)
@@ -0,0 +1,56 @@
+from typing import Optional
+import math
+import os
+import time
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from limits import parse, RateLimitItem
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from metrics import RATE_LIMIT_REJECTIONS
+from models import normalize_email
+
+load_dotenv()
+
+# Counters live in RATE_LIMIT_STORAGE_URI so every worker shares one budget and
+# limits survive restarts: redis://... in production, memory:// (in-process)
+# for development and tests.
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", os.getenv("REDIS_URL", "memory://"))
+# sliding-window-counter: two fixed-window counters weighted by overlap, O(1)
+# storage per key, without fixed-window bursts at window boundaries
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+# Per-account login budget, applied in addition to the per-IP route limit
+LOGIN_ACCOUNT_RATE_LIMIT = os.getenv("LOGIN_ACCOUNT_RATE_LIMIT", "10/15minute")
+# Only for load testing: turns off all limits
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    key_prefix="rl",
+    # Keep limiting in-process if the shared store is unreachable
+    in_memory_fallback_enabled=True,
+    enabled=RATE_LIMIT_ENABLED,
+)
+
+login_account_limit: RateLimitItem = parse(LOGIN_ACCOUNT_RATE_LIMIT)
+
+
+def check_account_limit(scope: str, account: str, limit: Optional[RateLimitItem] = None):
+    """Count an attempt against a per-account budget; raise 429 once it is spent"""
+    if not limiter.enabled:
+        return
+    limit = limit or login_account_limit
+    # Keyed like the stored account, so case/whitespace variants share one budget
+    key = normalize_email(account)
+    if limiter.limiter.hit(limit, scope, key):
+        return
+    RATE_LIMIT_REJECTIONS.labels(scope).inc()
+    reset_time, _ = limiter.limiter.get_window_stats(limit, scope, key)
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts for this account, try again later",
+        headers={"Retry-After": str(max(1, math.ceil(reset_time - time.time())))},
+    )
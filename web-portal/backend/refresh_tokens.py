@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import hashlib
+import hmac
+import os
+import secrets
+from dotenv import load_dotenv
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import RefreshToken
+
+load_dotenv()
+
+# Refresh tokens are random, so a keyed SHA-256 digest is enough to make a
+# leaked table useless; no bcrypt on the refresh path
+REFRESH_TOKEN_SECRET = os.getenv("REFRESH_TOKEN_SECRET") or os.getenv("SECRET_KEY", "")
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+
+class InvalidRefreshToken(Exception):
+    """Unknown, expired or revoked refresh token"""
+
+
+class RefreshTokenReused(InvalidRefreshToken):
+    """A rotated-out token was presented again; its whole family was revoked"""
+
+    def __init__(self, user_id: int):
+        super().__init__("Refresh token reuse detected")
+        self.user_id = user_id
+
+
+def hash_refresh_token(token: str) -> str:
+    return hmac.new(REFRESH_TOKEN_SECRET.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_refresh_token(db: AsyncSession, user_id: int, family_id: Optional[str] = None) -> str:
+    """Add a new refresh token to the session (caller commits); returns the plaintext"""
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        created_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token
+
+
+async def revoke_family(db: AsyncSession, family_id: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str, user_id: int):
+    """Revoke the session (family) a refresh token belongs to, if it is the user's"""
+    result = await db.execute(
+        select(RefreshToken.family_id).where(
+            RefreshToken.token_hash == hash_refresh_token(token),
+            RefreshToken.user_id == user_id,
+        )
+    )
+    family_id = result.scalar()
+    if family_id is not None:
+        await revoke_family(db, family_id)
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Tuple[int, str]:
+    """Exchange a refresh token for a new one in the same family and commit.
+
+    Returns (user_id, new token). Presenting a token that was already rotated
+    means it was copied, so the whole family is revoked and the legitimate
+    holder has to log in again.
+    """
+    result = await db.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token))
+    )
+    stored = result.scalars().first()
+    if stored is None:
+        raise InvalidRefreshToken("Unknown refresh token")
+    if stored.revoked_at is not None:
+        await revoke_family(db, stored.family_id)
+        await db.commit()
+        raise RefreshTokenReused(stored.user_id)
+    if stored.expires_at <= datetime.utcnow():
+        raise InvalidRefreshToken("Refresh token expired")
+
+    # Conditional update: of two concurrent rotations only one can win
+    claimed = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == stored.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+    if claimed.rowcount != 1:
+        await revoke_family(db, stored.family_id)
+        await db.commit()
+        raise RefreshTokenReused(stored.user_id)
+    new_token = issue_refresh_token(db, stored.user_id, stored.family_id)
+    await db.commit()
+    return stored.user_id, new_token
@@ -0,0 +1,309 @@
+"""Release catalog: app installers per platform and version.
+
+Installers are stored once, content-addressed, under RELEASES_DIR/objects/<sha256>
+and indexed in RELEASES_DIR/catalog.json. Publish a build with
+
+    python -m releases add 1.4.0 windows-x86_64 dist/LegalToolkit_1.4.0_x64-setup.exe
+    python -m releases list
+
+Publishing also builds patches to the new build from the platform's previous
+RELEASE_DELTA_HISTORY releases (see deltas.py); `python -m releases deltas`
+builds any that are missing. Workers pick up catalog changes on their next
+download or manifest request.
+"""
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import orjson
+from dotenv import load_dotenv
+
+from deltas import make_patch, apply_patch
+from downloads import FileInfo
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RELEASES_DIR = os.getenv("RELEASES_DIR", "releases")
+# Platform served by /download/app when the client doesn't name one
+RELEASE_DEFAULT_PLATFORM = os.getenv("RELEASE_DEFAULT_PLATFORM", "windows-x86_64")
+RELEASE_MANIFEST_MAX_AGE = int(os.getenv("RELEASE_MANIFEST_MAX_AGE", "60"))
+# Patches are built to each new release from this many earlier ones; 0 disables
+RELEASE_DELTA_HISTORY = int(os.getenv("RELEASE_DELTA_HISTORY", "3"))
+
+
+@dataclass(frozen=True)
+class Release:
+    version: str
+    platform: str
+    filename: str
+    sha256: str
+    size: int
+    published_at: str  # ISO 8601 UTC; the newest release per platform is "latest"
+
+
+@dataclass(frozen=True)
+class Patch:
+    platform: str
+    from_version: str
+    to_version: str
+    from_sha256: str
+    to_sha256: str
+    sha256: str  # of the patch itself
+    size: int
+
+    @property
+    def filename(self) -> str:
+        return f"{self.platform}-{self.from_version}-to-{self.to_version}.zst"
+
+
+Artifact = Union[Release, Patch]
+
+
+class ReleaseCatalog:
+    """In-memory index of the published releases and patches.
+
+    Digests and sizes are computed once, when a release is added, and read
+    back from catalog.json on load; serving a download never hashes a file.
+    """
+
+    def __init__(self, root: str = RELEASES_DIR):
+        self.root = root
+        self._releases: List[Release] = []  # oldest first
+        self._by_version: Dict[Tuple[str, str], Release] = {}
+        self._latest: Dict[str, Release] = {}
+        self._patches: Dict[Tuple[str, str], Patch] = {}  # (from_sha256, to_sha256)
+        self._artifacts: Dict[str, Artifact] = {}
+        self._loaded_mtime_ns: Optional[int] = None
+        self.manifest = b""
+        self.manifest_etag = ""
+        self.load()
+
+    @property
+    def catalog_path(self) -> str:
+        return os.path.join(self.root, "catalog.json")
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256)
+
+    def _read_catalog(self) -> Tuple[dict, Optional[int]]:
+        try:
+            with open(self.catalog_path, "rb") as f:
+                data = json.load(f)
+                mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+        except FileNotFoundError:
+            data, mtime_ns = {}, None
+        return {"releases": data.get("releases", []), "patches": data.get("patches", [])}, mtime_ns
+
+    def _write_catalog(self, data: dict):
+        os.makedirs(self.root, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.root, delete=False) as tmp:
+            json.dump(data, tmp, indent=2)
+        os.chmod(tmp.name, 0o644)
+        os.replace(tmp.name, self.catalog_path)
+
+    def _object_present(self, artifact: Artifact) -> bool:
+        try:
+            size = os.stat(self.object_path(artifact.sha256)).st_size
+        except FileNotFoundError:
+            logger.warning("Release catalog: object %s for %s is missing", artifact.sha256, artifact)
+            return False
+        if size != artifact.size:
+            logger.warning("Release catalog: object %s is %d bytes, expected %d", artifact.sha256, size, artifact.size)
+            return False
+        return True
+
+    def load(self):
+        """Rebuild the index from catalog.json, skipping entries whose object is missing"""
+        data, mtime_ns = self._read_catalog()
+        releases = [release for release in (Release(**entry) for entry in data["releases"])
+                    if self._object_present(release)]
+        releases.sort(key=lambda release: release.published_at)
+        published = {release.sha256 for release in releases}
+        patches = [patch for patch in (Patch(**entry) for entry in data["patches"])
+                   if patch.from_sha256 in published and patch.to_sha256 in published
+                   and self._object_present(patch)]
+
+        self._releases = releases
+        self._by_version = {(release.platform, release.version): release for release in releases}
+        self._latest = {release.platform: release for release in releases}
+        self._patches = {(patch.from_sha256, patch.to_sha256): patch for patch in patches}
+        self._artifacts = {artifact.sha256: artifact for artifact in [*releases, *patches]}
+        self.manifest = orjson.dumps({"platforms": {
+            platform: {
+                **asdict(release),
+                "patches": {
+                    patch.from_version: {"sha256": patch.sha256, "size": patch.size}
+                    for patch in patches if patch.to_sha256 == release.sha256
+                },
+            }
+            for platform, release in sorted(self._latest.items())
+        }})
+        self.manifest_etag = f'"{hashlib.sha256(self.manifest).hexdigest()}"'
+        self._loaded_mtime_ns = mtime_ns
+
+    def reload_if_changed(self):
+        """Reload after `releases add` from another process; one stat otherwise"""
+        try:
+            mtime_ns = os.stat(self.catalog_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        if mtime_ns != self._loaded_mtime_ns:
+            self.load()
+
+    def __bool__(self) -> bool:
+        return bool(self._releases)
+
+    def releases(self) -> List[Release]:
+        return list(self._releases)
+
+    def patches(self) -> List[Patch]:
+        return list(self._patches.values())
+
+    def get(self, platform: str, version: Optional[str] = None) -> Optional[Release]:
+        """A platform's release by version, or its latest"""
+        if version is None:
+            return self._latest.get(platform)
+        return self._by_version.get((platform, version))
+
+    def best_download(self, target: Release, from_version: Optional[str] = None) -> Artifact:
+        """The smallest artifact that gets a client on from_version to target"""
+        base = self.get(target.platform, from_version) if from_version else None
+        patch = self._patches.get((base.sha256, target.sha256)) if base else None
+        if patch is not None and patch.size < target.size:
+            return patch
+        return target
+
+    def artifact(self, sha256: str) -> Optional[Tuple[FileInfo, str]]:
+        """File info and download name of a release or patch object"""
+        artifact = self._artifacts.get(sha256)
+        if artifact is None:
+            return None
+        # Objects are immutable, so the digest doubles as a strong ETag
+        info = FileInfo(path=self.object_path(sha256), size=artifact.size, mtime_ns=0, etag=f'"{sha256}"')
+        return info, artifact.filename
+
+    def _store(self, data: bytes) -> str:
+        """Write bytes as a content-addressed object; returns the digest"""
+        objects_dir = os.path.join(self.root, "objects")
+        os.makedirs(objects_dir, exist_ok=True)
+        digest = hashlib.sha256(data).hexdigest()
+        with tempfile.NamedTemporaryFile(dir=objects_dir, delete=False) as tmp:
+            tmp.write(data)
+        os.chmod(tmp.name, 0o644)
+        os.replace(tmp.name, self.object_path(digest))
+        return digest
+
+    def add(self, version: str, platform: str, source: str, filename: Optional[str] = None,
+            deltas: bool = True) -> Release:
+        """Store an installer and publish it as the platform's latest release"""
+        objects_dir = os.path.join(self.root, "objects")
+        os.makedirs(objects_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        with open(source, "rb") as src, tempfile.NamedTemporaryFile(dir=objects_dir, delete=False) as tmp:
+            for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        os.chmod(tmp.name, 0o644)
+        # Identical builds share one object
+        os.replace(tmp.name, self.object_path(digest.hexdigest()))
+
+        release = Release(
+            version=version,
+            platform=platform,
+            filename=filename or os.path.basename(source),
+            sha256=digest.hexdigest(),
+            size=size,
+            published_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        )
+        data, _ = self._read_catalog()
+        data["releases"] = [entry for entry in data["releases"]
+                            if (entry["platform"], entry["version"]) != (platform, version)]
+        data["releases"].append(asdict(release))
+        self._write_catalog(data)
+        self.load()
+        if deltas:
+            self.build_patches(release)
+        return release
+
+    def build_patches(self, target: Release, history: int = RELEASE_DELTA_HISTORY) -> List[Patch]:
+        """Build missing patches to target from the platform's previous releases.
+
+        Each patch is checked by applying it before it is published.
+        """
+        earlier = [release for release in self._releases
+                   if release.platform == target.platform and release.sha256 != target.sha256
+                   and release.published_at <= target.published_at]
+        bases = earlier[-history:] if history > 0 else []
+        with open(self.object_path(target.sha256), "rb") as f:
+            new = f.read()
+        built = []
+        for base in bases:
+            if (base.sha256, target.sha256) in self._patches:
+                continue
+            with open(self.object_path(base.sha256), "rb") as f:
+                old = f.read()
+            patch_bytes = make_patch(old, new)
+            if hashlib.sha256(apply_patch(old, patch_bytes)).hexdigest() != target.sha256:
+                raise RuntimeError(f"Patch {base.version} -> {target.version} does not reproduce the release")
+            built.append(Patch(
+                platform=target.platform,
+                from_version=base.version,
+                to_version=target.version,
+                from_sha256=base.sha256,
+                to_sha256=target.sha256,
+                sha256=self._store(patch_bytes),
+                size=len(patch_bytes),
+            ))
+        if built:
+            data, _ = self._read_catalog()
+            data["patches"].extend(asdict(patch) for patch in built)
+            self._write_catalog(data)
+            self.load()
+        return built
+
+
+release_catalog = ReleaseCatalog()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the app release catalog")
+    parser.add_argument("--root", default=RELEASES_DIR, help="Catalog directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Publish an installer")
+    add.add_argument("version")
+    add.add_argument("platform", help="e.g. windows-x86_64, darwin-aarch64, linux-x86_64")
+    add.add_argument("file")
+    add.add_argument("--filename", help="Download name (defaults to the file's name)")
+    add.add_argument("--no-deltas", action="store_true", help="Skip building patches")
+    commands.add_parser("deltas", help="Build missing patches to each platform's latest release")
+    commands.add_parser("list", help="Show published releases and patches")
+    args = parser.parse_args(argv)
+
+    catalog = ReleaseCatalog(args.root)
+    if args.command == "add":
+        release = catalog.add(args.version, args.platform, args.file, args.filename, deltas=not args.no_deltas)
+        print(f"{release.platform} {release.version} {release.sha256} {release.size}")
+    elif args.command == "deltas":
+        for platform in sorted({release.platform for release in catalog.releases()}):
+            for patch in catalog.build_patches(catalog.get(platform)):
+                print(f"{patch.filename} {patch.size}")
+    else:
+        for release in catalog.releases():
+            print(f"{release.published_at} {release.platform:<16} {release.version:<10} "
+                  f"{release.sha256[:12]} {release.size:>12} {release.filename}")
+        for patch in catalog.patches():
+            print(f"{'patch':<20} {patch.platform:<16} {patch.from_version + ' -> ' + patch.to_version:<10} "
+                  f"{patch.sha256[:12]} {patch.size:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+import asyncio
+import hashlib
+import logging
+import math
+import os
+from dotenv import load_dotenv
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, get_async_engine
+from models import RevokedToken
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Revocation list configuration. Each worker reloads the revoked jti set into a
+# bloom filter every REVOCATION_REFRESH_INTERVAL seconds; a revocation made on
+# another worker is enforced here after at most that long.
+REVOCATION_REFRESH_INTERVAL = float(os.getenv("REVOCATION_REFRESH_INTERVAL", "30"))
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings; no false negatives"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Revoked access-token ids, checked through a per-worker bloom filter.
+
+    A negative answer from the filter is authoritative, so the common
+    "not revoked" case costs no query; a positive is confirmed in the database.
+    """
+
+    def __init__(self, refresh_interval: float = REVOCATION_REFRESH_INTERVAL,
+                 capacity: int = REVOCATION_BLOOM_CAPACITY, error_rate: float = REVOCATION_BLOOM_ERROR_RATE):
+        self.refresh_interval = refresh_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        # Revoked on this worker and not yet expired; re-added on every reload
+        # in case the snapshot was read before the revocation committed
+        self._local: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.lookups = 0
+        self.db_checks = 0
+
+    def load(self, jtis: Iterable[str]):
+        """Replace the filter with one holding `jtis` and this worker's revocations"""
+        now = datetime.utcnow()
+        self._local = {jti: expires for jti, expires in self._local.items() if expires >= now}
+        jtis = set(jtis) | self._local.keys()
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter = bloom
+
+    async def refresh(self):
+        """Reload unexpired revocations and prune expired ones"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal(bind=get_async_engine()) as db:
+            await db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+            await db.commit()
+            result = await db.execute(select(RevokedToken.jti).where(RevokedToken.expires_at >= now))
+            self.load(result.scalars().all())
+
+    async def revoke(self, db: AsyncSession, jti: str, user_id: Optional[int], expires_at: datetime):
+        """Persist a revocation (caller commits); effective on this worker at once"""
+        insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+        await db.execute(
+            insert(RevokedToken)
+            .values(jti=jti, user_id=user_id, expires_at=expires_at, revoked_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["jti"])
+        )
+        self._local[jti] = expires_at
+        self._filter.add(jti)
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        self.lookups += 1
+        if jti not in self._filter:
+            return False
+        self.db_checks += 1
+        result = await db.execute(select(RevokedToken.jti).where(RevokedToken.jti == jti))
+        return result.first() is not None
+
+    def clear(self):
+        self._local = {}
+        self.load(())
+
+    def stats(self) -> dict:
+        return {
+            "entries": self._filter.count,
+            "filter_bits": self._filter.size,
+            "hash_count": self._filter.hash_count,
+            "lookups": self.lookups,
+            "db_checks": self.db_checks,
+        }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Keep serving from the previous filter
+                logger.exception("Revocation list refresh failed")
+            await asyncio.sleep(self.refresh_interval)
+
+
+revocation_list = RevocationList()
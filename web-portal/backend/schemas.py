@@ -1,53 +1,90 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
 from typing import Optional
 from datetime import datetime
-import re
+
+PASSWORD_MIN_LENGTH = 12
+PASSWORD_SPECIAL_CHARACTERS = frozenset('!@#$%^&*(),.?":{}|<>')
+
+
+def check_password_strength(password: str) -> Optional[str]:
+    """Return the first unmet password rule, or None; one pass over the string"""
+    if len(password) < PASSWORD_MIN_LENGTH:
+        return f'Password must be at least {PASSWORD_MIN_LENGTH} characters long'
+    has_upper = has_lower = has_digit = has_special = False
+    for char in password:
+        if 'A' <= char <= 'Z':
+            has_upper = True
+        elif 'a' <= char <= 'z':
+            has_lower = True
+        elif char.isdecimal():
+            has_digit = True
+        elif char in PASSWORD_SPECIAL_CHARACTERS:
+            has_special = True
+    if not has_upper:
+        return 'Password must contain at least one uppercase letter'
+    if not has_lower:
+        return 'Password must contain at least one lowercase letter'
+    if not has_digit:
+        return 'Password must contain at least one number'
+    if not has_special:
+        return 'Password must contain at least one special character'
+    return None
 
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
     full_name: str
-    
-    @validator('password')
-    def validate_password(cls, v):
-        if len(v) < 12:
-            raise ValueError('Password must be at least 12 characters long')
-        if not re.search(r'[A-Z]', v):
-            raise ValueError('Password must contain at least one uppercase letter')
-        if not re.search(r'[a-z]', v):
-            raise ValueError('Password must contain at least one lowercase letter')
-        if not re.search(r'\d', v):
-            raise ValueError('Password must contain at least one number')
-        if not re.search(r'[!@#$%^&*(),.?":{}|<>]', v):
-            raise ValueError('Password must contain at least one special character')
+
+    @field_validator('password')
+    @classmethod
+    def validate_password(cls, v: str) -> str:
+        error = check_password_strength(v)
+        if error:
+            raise ValueError(error)
         return v
-    
-    @validator('full_name')
-    def validate_full_name(cls, v):
-        if len(v.strip()) < 2:
+
+    @field_validator('full_name')
+    @classmethod
+    def validate_full_name(cls, v: str) -> str:
+        v = v.strip()
+        if len(v) < 2:
             raise ValueError('Full name must be at least 2 characters long')
-        return v.strip()
+        return v
 
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class SubscriptionInfo(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    plan_type: str
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+
 class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     email: str
     full_name: str
     is_active: bool
     created_at: datetime
-    subscription: Optional[dict] = None
-    
-    class Config:
-        from_attributes = True
+    subscription: Optional[SubscriptionInfo] = None
 
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None  # access token lifetime, seconds
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 class CheckoutRequest(BaseModel):
     plan_type: str  # "one_time" or "monthly"
     success_url: str
-    cancel_url: str
\ No newline at end of file
+    cancel_url: str
@@ -0,0 +1,136 @@
+from typing import Any, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import random
+import uuid
+from urllib.parse import urlencode
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Stripe API client configuration
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "https://api.stripe.com")
+STRIPE_API_VERSION = os.getenv("STRIPE_API_VERSION", "2023-10-16")  # stripe 7.8 default
+STRIPE_TIMEOUT = float(os.getenv("STRIPE_TIMEOUT", "10"))
+STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT", "3"))
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "2"))
+STRIPE_RETRY_BACKOFF = float(os.getenv("STRIPE_RETRY_BACKOFF", "0.5"))
+STRIPE_MAX_CONNECTIONS = int(os.getenv("STRIPE_MAX_CONNECTIONS", "20"))
+
+# Responses worth retrying (rate limited, conflicts, Stripe-side errors)
+RETRYABLE_STATUSES = {409, 429, 500, 502, 503, 504}
+
+
+class StripeGatewayError(Exception):
+    """A Stripe API call failed after retries"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def encode_form(params: Any, prefix: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Flatten nested params into Stripe's bracketed form encoding.
+
+    {"line_items": [{"quantity": 1}]} -> [("line_items[0][quantity]", "1")];
+    None values are omitted, as the official client does.
+    """
+    pairs: List[Tuple[str, str]] = []
+    if isinstance(params, dict):
+        for key, value in params.items():
+            pairs.extend(encode_form(value, f"{prefix}[{key}]" if prefix else key))
+    elif isinstance(params, (list, tuple)):
+        for index, value in enumerate(params):
+            pairs.extend(encode_form(value, f"{prefix}[{index}]"))
+    elif params is None:
+        pass
+    elif isinstance(params, bool):
+        pairs.append((prefix, "true" if params else "false"))
+    else:
+        pairs.append((prefix, str(params)))
+    return pairs
+
+
+class StripeGateway:
+    """Non-blocking Stripe API client with a pooled HTTP connection, timeouts
+    and retries with exponential backoff.
+
+    POSTs carry an Idempotency-Key that is reused across retries, so a retry
+    after a timeout never creates a second object.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, api_base: str = STRIPE_API_BASE,
+                 timeout: float = STRIPE_TIMEOUT, max_retries: int = STRIPE_MAX_RETRIES,
+                 backoff: float = STRIPE_RETRY_BACKOFF,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_key = api_key
+        self.api_base = api_base
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.api_base,
+                timeout=httpx.Timeout(self.timeout, connect=STRIPE_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=STRIPE_MAX_CONNECTIONS,
+                    max_keepalive_connections=STRIPE_MAX_CONNECTIONS,
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, params: Optional[dict] = None) -> dict:
+        """Call the Stripe API and return the decoded JSON body"""
+        api_key = self.api_key or os.getenv("STRIPE_SECRET_KEY")
+        if not api_key:
+            raise StripeGatewayError("STRIPE_SECRET_KEY is not configured")
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Stripe-Version": STRIPE_API_VERSION,
+        }
+        if method == "POST":
+            headers["Idempotency-Key"] = str(uuid.uuid4())
+        body = urlencode(encode_form(params or {}))
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self._get_client().request(method, path, content=body, headers=headers)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise StripeGatewayError(f"Stripe request failed: {e!r}")
+                logger.warning("Stripe %s %s transport error (attempt %d): %r", method, path, attempt + 1, e)
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                if last_attempt or response.status_code not in RETRYABLE_STATUSES:
+                    try:
+                        message = response.json()["error"]["message"]
+                    except (ValueError, KeyError, TypeError):
+                        message = response.text
+                    raise StripeGatewayError(message, status_code=response.status_code)
+                logger.warning("Stripe %s %s returned %d (attempt %d)", method, path,
+                               response.status_code, attempt + 1)
+            # Full jitter keeps retries from many workers from synchronizing
+            await asyncio.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    async def create_checkout_session(self, **params: Any) -> dict:
+        return await self.request("POST", "/v1/checkout/sessions", params)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+stripe_gateway = StripeGateway()
@@ -1,22 +1,40 @@
 import pytest
+import hashlib
+import hmac
+import json
 import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("STRIPE_WEBHOOK_SECRET", "whsec_test_secret")
+
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
-from main import app
+from main import app, limiter
 from database import Base, get_db
+from principals import user_cache
+from entitlements import entitlement_cache
+from health import readiness
+from revocation import revocation_list
+from auth import token_cache
 
 # Test database setup
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
+# Schema management uses a sync engine; requests use aiosqlite. NullPool keeps
+# connections from leaking across the event loops TestClient spins up.
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+    poolclass=NullPool,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+TestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 @pytest.fixture(scope="function")
 def test_db():
@@ -24,17 +42,20 @@ def test_db():
     yield
     Base.metadata.drop_all(bind=engine)
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+async def override_get_db():
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 app.dependency_overrides[get_db] = override_get_db
 
 @pytest.fixture(scope="function")
 def client(test_db):
+    limiter.reset()
+    user_cache.clear()
+    entitlement_cache.clear()
+    readiness.clear()
+    revocation_list.clear()
+    token_cache.clear()
     return TestClient(app)
 
 @pytest.fixture
@@ -45,10 +66,53 @@ def test_user_data():
         "full_name": "Test User"
     }
 
+@pytest.fixture
+def auth_tokens(client, test_user_data):
+    """Register test_user_data and log in; returns the login response body"""
+    client.post("/auth/register", json=test_user_data)
+    response = client.post("/auth/login", json={
+        "email": test_user_data["email"],
+        "password": test_user_data["password"]
+    })
+    assert response.status_code == 200
+    return response.json()
+
+@pytest.fixture
+def auth_headers(auth_tokens):
+    """Bearer headers for the logged-in test user"""
+    return {"Authorization": f"Bearer {auth_tokens['access_token']}"}
+
+@pytest.fixture
+def internal_headers(monkeypatch):
+    """Configure INTERNAL_API_TOKEN; headers for the operational endpoints"""
+    import main
+    monkeypatch.setattr(main, "INTERNAL_API_TOKEN", "internal-token")
+    return {"Authorization": "Bearer internal-token"}
+
 @pytest.fixture
 def test_user_weak_password():
     return {
-        "email": "test@example.com", 
+        "email": "test@example.com",
         "password": "weak",
         "full_name": "Test User"
-    }
\ No newline at end of file
+    }
+
+def sign_stripe_payload(payload: bytes) -> str:
+    """Build a Stripe-Signature header for payload using the test webhook secret"""
+    timestamp = int(time.time())
+    signed = f"{timestamp}.".encode() + payload
+    secret = os.environ["STRIPE_WEBHOOK_SECRET"].encode()
+    signature = hmac.new(secret, signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+@pytest.fixture
+def post_stripe_event(client):
+    """Post a signed Stripe event to the webhook endpoint"""
+    def post(event: dict):
+        payload = json.dumps(event).encode()
+        return client.post(
+            "/webhook/stripe",
+            content=payload,
+            headers={"stripe-signature": sign_stripe_payload(payload), "content-type": "application/json"},
+        )
+    return post
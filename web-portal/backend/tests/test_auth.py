@@ -96,4 +96,4 @@ def test_get_user_profile_with_token(client: TestClient, test_user_data):
     assert response.status_code == 200
     data = response.json()
     assert data["email"] == test_user_data["email"]
-    assert data["full_name"] == test_user_data["full_name"]
\ No newline at end of file
+    assert data["full_name"] == test_user_data["full_name"]
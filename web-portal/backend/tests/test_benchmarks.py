@@ -0,0 +1,28 @@
+from benchmarks.load_test import compare, percentile, summarize
+
+
+def test_percentile_nearest_rank():
+    """Test percentiles use the nearest-rank method and tolerate no samples"""
+    samples = [float(n) for n in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 95) == 95.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_summarize_counts_errors():
+    """Test non-2xx and failed requests count as errors"""
+    result = summarize("login", [0.01, 0.02, 0.03, 0.04], [200, 200, 401, 0], duration=2.0)
+    assert result.requests == 4
+    assert result.errors == 2
+    assert result.throughput == 2.0
+    assert result.status_counts == {"200": 2, "401": 1, "0": 1}
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    """Test only latency, throughput and error changes beyond tolerance are flagged"""
+    baseline = {"profile": {"p95_ms": 10.0, "throughput": 100.0, "errors": 0}}
+    within = {"profile": {"p95_ms": 11.5, "throughput": 85.0, "errors": 0}}
+    worse = {"profile": {"p95_ms": 13.0, "throughput": 70.0, "errors": 2}}
+    assert compare(baseline, within, tolerance=0.2) == []
+    assert len(compare(baseline, worse, tolerance=0.2)) == 3
@@ -0,0 +1,66 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from stripe_gateway import StripeGateway, encode_form
+from benchmarks import fake_stripe
+
+@pytest.fixture
+def gateway(monkeypatch):
+    """Route checkout calls to the in-process fake Stripe API"""
+    fake_stripe.reset()
+    gateway = StripeGateway(
+        api_key="sk_test_fake",
+        api_base="http://fake-stripe",
+        timeout=0.5,
+        max_retries=2,
+        backoff=0,
+        transport=httpx.ASGITransport(app=fake_stripe.app),
+    )
+    monkeypatch.setattr(main, "stripe_gateway", gateway)
+    return gateway
+
+def _checkout(client: TestClient, headers: dict, plan_type: str = "monthly"):
+    return client.post("/payment/create-checkout", headers=headers, json={
+        "plan_type": plan_type,
+        "success_url": "https://example.com/success",
+        "cancel_url": "https://example.com/cancel",
+    })
+
+def test_encode_form_matches_stripe_conventions():
+    """Test nested params flatten to bracketed keys and None values are dropped"""
+    pairs = encode_form({"line_items": [{"quantity": 1, "recurring": None}], "metadata": {"a": "b"}})
+    assert pairs == [("line_items[0][quantity]", "1"), ("metadata[a]", "b")]
+
+def test_create_checkout_session(client: TestClient, auth_headers, gateway):
+    """Test checkout returns the session url and sends the plan metadata"""
+    response = _checkout(client, auth_headers)
+    assert response.status_code == 200
+    assert response.json()["checkout_url"].startswith("https://checkout.stripe.test/")
+    form = fake_stripe.app.state.requests[0]["form"]
+    assert form["mode"] == "subscription"
+    assert form["line_items[0][price_data][recurring][interval]"] == "month"
+    assert form["metadata[plan_type]"] == "monthly"
+
+def test_create_checkout_invalid_plan(client: TestClient, auth_headers, gateway):
+    """Test an unknown plan is a 400 and never reaches Stripe"""
+    response = _checkout(client, auth_headers, plan_type="lifetime")
+    assert response.status_code == 400
+    assert fake_stripe.app.state.requests == []
+
+def test_create_checkout_retries_with_same_idempotency_key(client: TestClient, auth_headers, gateway):
+    """Test transient Stripe errors are retried without creating duplicate sessions"""
+    fake_stripe.app.state.fail_statuses = [503, 429]
+    response = _checkout(client, auth_headers)
+    assert response.status_code == 200
+    keys = {r["idempotency_key"] for r in fake_stripe.app.state.requests}
+    assert len(fake_stripe.app.state.requests) == 3
+    assert len(keys) == 1
+
+def test_create_checkout_gives_up_after_retries(client: TestClient, auth_headers, gateway):
+    """Test persistent Stripe failures surface as an error instead of hanging"""
+    fake_stripe.app.state.fail_statuses = [500, 500, 500]
+    response = _checkout(client, auth_headers)
+    assert response.status_code == 500
+    assert "Failed to create checkout session" in response.json()["detail"]
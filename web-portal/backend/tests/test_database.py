@@ -0,0 +1,56 @@
+from database import to_async_url, to_sync_url
+
+def test_async_url_derived_from_sync_url():
+    """Test DATABASE_URL in sync form maps to the asyncio drivers"""
+    assert to_async_url("postgresql://u:p@db/app").drivername == "postgresql+asyncpg"
+    assert to_async_url("sqlite:///./app.db").drivername == "sqlite+aiosqlite"
+    assert to_async_url("postgresql+asyncpg://u:p@db/app").drivername == "postgresql+asyncpg"
+
+def test_sync_url_derived_from_async_url():
+    """Test an async DATABASE_URL still yields a blocking URL for schema management"""
+    assert to_sync_url("postgresql+asyncpg://u:p@db/app").drivername == "postgresql+psycopg2"
+    assert to_sync_url("sqlite+aiosqlite:///./app.db").drivername == "sqlite+pysqlite"
+
+def test_pool_stats_for_queue_pool():
+    """Test pool stats report checkout counts and wait times for server databases"""
+    from database import create_app_engine, _pool_stats
+    engine = create_app_engine("postgresql://u:p@localhost/app")
+    stats = _pool_stats(engine)
+    assert stats["pool"] == "TimedQueuePool"
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 0
+    assert "wait_max_ms" in stats
+
+def test_health_pool_endpoint(client, internal_headers):
+    """Test the pool stats endpoint reports the primary pool"""
+    response = client.get("/health/pool", headers=internal_headers)
+    assert response.status_code == 200
+    assert "primary" in response.json()
+
+def test_health_pool_requires_internal_token(client, internal_headers, monkeypatch):
+    """Test pool stats are hidden without the token and refused with a wrong one"""
+    assert client.get("/health/pool").status_code == 401
+    assert client.get("/health/pool", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    import main
+    monkeypatch.setattr(main, "INTERNAL_API_TOKEN", "")
+    assert client.get("/health/pool", headers=internal_headers).status_code == 404
+
+def test_verify_schema(tmp_path):
+    """Test startup verification accepts a migrated database and rejects a stale one"""
+    import asyncio
+    import pytest
+    from alembic import command
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from database import alembic_config, verify_schema, SchemaOutOfDate
+
+    path = tmp_path / "schema.db"
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    with pytest.raises(SchemaOutOfDate):
+        asyncio.run(verify_schema(async_engine))
+
+    sync_engine = create_engine(f"sqlite:///{path}")
+    with sync_engine.begin() as connection:
+        command.upgrade(alembic_config(connection), "head")
+    sync_engine.dispose()
+    asyncio.run(verify_schema(async_engine))
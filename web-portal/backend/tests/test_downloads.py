@@ -0,0 +1,103 @@
+import os
+from datetime import timedelta
+import pytest
+from fastapi.testclient import TestClient
+
+import downloads
+from auth import create_access_token
+from downloads import RangeNotSatisfiable, etag_matches, parse_range
+
+CONTENT = os.urandom(3 * 1024 + 17)
+
+
+@pytest.fixture
+def app_binary(tmp_path, monkeypatch):
+    path = tmp_path / "LegalToolkit-setup.exe"
+    path.write_bytes(CONTENT)
+    monkeypatch.setattr(downloads, "APP_DOWNLOAD_PATH", str(path))
+    monkeypatch.setattr(downloads, "DOWNLOAD_CHUNK_SIZE", 1024)
+    return path
+
+@pytest.fixture
+def file_url():
+    token = create_access_token({"sub": "1", "type": "download"}, expires_delta=timedelta(hours=1))
+    return f"/download/app/file?token={token}"
+
+def test_parse_range():
+    """Test single byte ranges are parsed and unsupported forms ignored"""
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=100-", 100)
+
+def test_etag_matches():
+    """Test If-None-Match matches strong, weak and wildcard validators"""
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"x"', '"abc"')
+
+def test_download_full_file(client: TestClient, app_binary, file_url):
+    """Test a plain GET streams the whole file with download headers"""
+    response = client.get(file_url)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert 'filename="LegalToolkit-setup.exe"' in response.headers["content-disposition"]
+    assert response.headers["etag"].startswith('"')
+
+def test_download_range_resumes(client: TestClient, app_binary, file_url):
+    """Test Range resumes a transfer unless If-Range is stale, and 416 past the end"""
+    etag = client.head(file_url).headers["etag"]
+    response = client.get(file_url, headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == CONTENT[1000:]
+    assert response.headers["content-range"] == f"bytes 1000-{len(CONTENT) - 1}/{len(CONTENT)}"
+
+    # A stale If-Range validator gets the whole (changed) file
+    response = client.get(file_url, headers={"Range": "bytes=1000-", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+    response = client.get(file_url, headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+def test_download_if_none_match(client: TestClient, app_binary, file_url):
+    """Test a matching ETag gets 304 until the file changes"""
+    etag = client.get(file_url).headers["etag"]
+    response = client.get(file_url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    app_binary.write_bytes(CONTENT + b"v2")
+    response = client.get(file_url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_download_token_scopes(client: TestClient, app_binary, file_url):
+    """Test access tokens can't fetch the file and download tokens can't call the API"""
+    access_token = create_access_token({"sub": "1"})
+    assert client.get(f"/download/app/file?token={access_token}").status_code == 401
+    download_token = file_url.split("token=")[1]
+    response = client.get("/user/profile", headers={"Authorization": f"Bearer {download_token}"})
+    assert response.status_code == 401
+
+def test_download_slots_exhausted(client: TestClient, app_binary, file_url):
+    """Test transfers beyond the per-worker limit get 503 and release their slot"""
+    slots = downloads.download_slots
+    limit, slots.limit = slots.limit, 0
+    try:
+        response = client.get(file_url)
+    finally:
+        slots.limit = limit
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+    assert client.get(file_url).status_code == 200
+    assert downloads.download_slots.active == 0
@@ -0,0 +1,45 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+from entitlements import entitlement_cache
+from models import UserSubscription
+from tests.conftest import TestingSessionLocal
+
+async def _cancel_subscriptions():
+    async with TestingSessionLocal() as db:
+        await db.execute(update(UserSubscription).values(is_active=False, status="canceled"))
+        await db.commit()
+
+async def _subscription_rows():
+    async with TestingSessionLocal() as db:
+        return (await db.execute(select(UserSubscription.is_active, UserSubscription.status))).all()
+
+def test_download_requires_subscription(client: TestClient, auth_headers, monkeypatch):
+    """Test download is refused without an active subscription outside test mode"""
+    monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_live_example")
+    response = client.get("/download/app", headers=auth_headers)
+    assert response.status_code == 403
+
+def test_entitlement_memoized_across_requests(client: TestClient, auth_headers, internal_headers, monkeypatch):
+    """Test the subscription created on download is served from cache afterwards"""
+    monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_example")
+    assert client.get("/download/app", headers=auth_headers).status_code == 200
+
+    misses = entitlement_cache.misses
+    assert client.get("/download/app", headers=auth_headers).status_code == 200
+    profile = client.get("/user/profile", headers=auth_headers).json()
+    assert profile["subscription"]["plan_type"] == "test_subscription"
+    assert entitlement_cache.misses == misses
+    assert client.get("/health/caches", headers=internal_headers).json()["entitlements"]["hits"] >= 2
+    assert client.get("/health/caches").status_code == 401
+
+def test_test_mode_reactivates_lapsed_test_subscription(client: TestClient, auth_headers, monkeypatch):
+    """Test an inactive test subscription is reactivated rather than inserted again"""
+    monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_example")
+    assert client.get("/download/app", headers=auth_headers).status_code == 200
+    asyncio.run(_cancel_subscriptions())
+    entitlement_cache.clear()
+
+    assert client.get("/download/app", headers=auth_headers).status_code == 200
+    assert asyncio.run(_subscription_rows()) == [(True, "active")]
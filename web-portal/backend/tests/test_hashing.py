@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import pytest
+from sqlalchemy import select
+
+import auth
+from hashing import HashingOverloaded, HashingService
+from models import User
+from tests.conftest import TestingSessionLocal
+
+def _blocking(event: threading.Event) -> str:
+    event.wait(timeout=5)
+    return "done"
+
+@pytest.mark.asyncio
+async def test_hashing_service_runs_off_loop():
+    """Test work submitted to the pool completes and records timings"""
+    service = HashingService(executor="thread", workers=2, max_queue=4)
+    try:
+        result = await service.run(lambda a, b: a + b, 2, 3)
+        assert result == 5
+        stats = service.stats()
+        assert stats["hash_latency"]["count"] == 1
+        assert stats["queue_wait"]["count"] == 1
+        assert stats["pending"] == 0
+    finally:
+        service.shutdown()
+
+@pytest.mark.asyncio
+async def test_hashing_service_sheds_load_when_queue_full():
+    """Test calls beyond max_queue are rejected instead of queued"""
+    service = HashingService(executor="thread", workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        in_flight = asyncio.ensure_future(service.run(_blocking, release))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HashingOverloaded):
+            await service.run(_blocking, release)
+        release.set()
+        assert await in_flight == "done"
+        assert service.stats()["rejected"] == 1
+    finally:
+        release.set()
+        service.shutdown()
+
+async def _load_hash(email: str) -> str:
+    async with TestingSessionLocal() as db:
+        return (await db.execute(select(User.hashed_password).where(User.email == email))).scalar_one()
+
+def _stored_hash(email: str) -> str:
+    return asyncio.run(_load_hash(email))
+
+def test_login_rehashes_outdated_hash(client, test_user_data, monkeypatch):
+    """Test a hash below the configured bcrypt cost is replaced on login"""
+    monkeypatch.setattr(auth, "pwd_context", auth.build_password_context("bcrypt", bcrypt_rounds=4))
+    client.post("/auth/register", json=test_user_data)
+    assert _stored_hash(test_user_data["email"]).startswith("$2b$04$")
+
+    monkeypatch.setattr(auth, "pwd_context", auth.build_password_context("bcrypt", bcrypt_rounds=5))
+    login = {"email": test_user_data["email"], "password": test_user_data["password"]}
+    assert client.post("/auth/login", json=login).status_code == 200
+    assert _stored_hash(test_user_data["email"]).startswith("$2b$05$")
+
+    # Still valid after the upgrade, and not rewritten again
+    upgraded = _stored_hash(test_user_data["email"])
+    assert client.post("/auth/login", json=login).status_code == 200
+    assert _stored_hash(test_user_data["email"]) == upgraded
+
+def test_bcrypt_hashes_migrate_to_argon2():
+    """Test switching schemes keeps old hashes valid and marks them for rehash"""
+    bcrypt_hash = auth.build_password_context("bcrypt", bcrypt_rounds=4).hash("TestPassword123!")
+    argon2 = auth.build_password_context("argon2", argon2_time_cost=1, argon2_memory_cost=1024, argon2_parallelism=1)
+    valid, new_hash = argon2.verify_and_update("TestPassword123!", bcrypt_hash)
+    assert valid
+    assert new_hash.startswith("$argon2id$")
@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+
+import health
+
+
+def test_live_touches_no_dependencies(client: TestClient, monkeypatch):
+    """Test liveness succeeds even when the database is unreachable"""
+    async def broken():
+        raise ConnectionError("database down")
+    monkeypatch.setattr(health, "probe_database", broken)
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+def test_ready_reports_checks(client: TestClient):
+    """Test readiness probes the database, pool and webhook queue"""
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["checks"]["database"]["ok"] is True
+    assert body["checks"]["webhooks"]["pending"] == 0
+
+def test_ready_fails_when_database_down(client: TestClient, monkeypatch):
+    """Test a failed database probe makes the worker not ready"""
+    async def broken():
+        raise ConnectionError("database down")
+    monkeypatch.setattr(health, "probe_database", broken)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["database"]["ok"] is False
+
+def test_ready_result_is_cached(client: TestClient, monkeypatch):
+    """Test repeated probes within the TTL run the checks once"""
+    calls = []
+    async def counting():
+        calls.append(1)
+        return {"ok": True}
+    monkeypatch.setattr(health, "probe_database", counting)
+    for _ in range(5):
+        assert client.get("/health/ready").status_code == 200
+    assert len(calls) == 1
+
+def test_ready_fails_on_webhook_backlog(client: TestClient, post_stripe_event, monkeypatch):
+    """Test a backlog above the configured limit fails readiness"""
+    monkeypatch.setattr(health, "HEALTH_MAX_WEBHOOK_BACKLOG", 1)
+    for n in range(2):
+        post_stripe_event({"id": f"evt_backlog_{n}", "type": "invoice.paid", "data": {"object": {}}})
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["webhooks"]["pending"] == 2
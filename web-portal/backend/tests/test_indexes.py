@@ -0,0 +1,71 @@
+import os
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, inspect, select, text
+
+from database import Base, alembic_config
+from models import UserSubscription
+from tests.conftest import engine
+
+ACTIVE_INDEX = "ix_user_subscriptions_user_id_is_active"
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+def _active_subscription_sql(bind) -> str:
+    stmt = select(UserSubscription).where(
+        UserSubscription.user_id == 1,
+        UserSubscription.is_active == True
+    )
+    return str(stmt.compile(bind, compile_kwargs={"literal_binds": True}))
+
+def test_sqlite_planner_uses_active_subscription_index(test_db):
+    """Test the active-subscription lookup is an index search, not a table scan"""
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {_active_subscription_sql(engine)}").fetchall()
+    details = " ".join(row[-1] for row in plan)
+    assert ACTIVE_INDEX in details
+    assert "SCAN" not in details
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+def test_postgres_planner_uses_active_subscription_index():
+    """Test Postgres can serve the active-subscription lookup from the index"""
+    pg_engine = create_engine(TEST_POSTGRES_URL)
+    Base.metadata.create_all(bind=pg_engine)
+    try:
+        with pg_engine.connect() as conn:
+            # Tiny test tables would otherwise always be seq-scanned
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            plan = conn.exec_driver_sql(f"EXPLAIN {_active_subscription_sql(pg_engine)}").fetchall()
+        assert ACTIVE_INDEX in " ".join(row[0] for row in plan)
+    finally:
+        Base.metadata.drop_all(bind=pg_engine)
+        pg_engine.dispose()
+
+def test_migrations_match_models(tmp_path):
+    """Test upgrading an empty database yields the indexes declared on the models"""
+    migrated = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    with migrated.begin() as connection:
+        command.upgrade(alembic_config(connection), "head")
+    indexes = {ix["name"]: ix for ix in inspect(migrated).get_indexes("user_subscriptions")}
+    assert indexes[ACTIVE_INDEX]["column_names"] == ["user_id", "is_active"]
+    assert indexes["uq_user_subscriptions_stripe_subscription_id"]["unique"]
+    user_indexes = {ix["name"]: ix for ix in inspect(migrated).get_indexes("users")}
+    assert user_indexes["uq_users_email_normalized"]["column_names"] == ["email_normalized"]
+    assert user_indexes["uq_users_email_normalized"]["unique"]
+    migrated.dispose()
+
+def test_migration_refuses_duplicate_subscriptions(tmp_path):
+    """Test duplicate Stripe subscriptions abort the index migration instead of being deleted"""
+    migrated = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    with migrated.begin() as connection:
+        command.upgrade(alembic_config(connection), "0001")
+        for is_active in (False, True):
+            connection.execute(text(
+                "INSERT INTO user_subscriptions (user_id, plan_type, stripe_subscription_id, is_active) "
+                "VALUES (1, 'monthly', 'sub_1', :is_active)"
+            ), {"is_active": is_active})
+    with migrated.begin() as connection:
+        with pytest.raises(RuntimeError, match="sub_1 \\(2 rows\\)"):
+            command.upgrade(alembic_config(connection), "head")
+    with migrated.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM user_subscriptions")).scalar() == 2
+    migrated.dispose()
@@ -0,0 +1,48 @@
+import json
+import logging
+import queue
+
+from logging_config import DeferredQueueHandler, JsonFormatter, SamplingFilter, parse_sample_rates
+
+def _record(msg: str, *args, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("main", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_json_formatter_includes_extra_fields():
+    """Test records render as one JSON object with their structured fields"""
+    line = JsonFormatter().format(_record("Login attempt for email: %s", "a@example.com", event="login_attempt"))
+    entry = json.loads(line)
+    assert entry["message"] == "Login attempt for email: a@example.com"
+    assert entry["event"] == "login_attempt"
+    assert entry["level"] == "INFO"
+
+def test_queue_handler_defers_formatting():
+    """Test the request thread only enqueues; msg % args is left to the listener"""
+    log_queue = queue.Queue(maxsize=1)
+    handler = DeferredQueueHandler(log_queue)
+    handler.handle(_record("user %s", "a@example.com"))
+    queued = log_queue.get_nowait()
+    assert queued.msg == "user %s"
+    assert queued.args == ("a@example.com",)
+
+    handler.handle(_record("one"))
+    handler.handle(_record("two"))
+    assert handler.dropped == 1
+
+def test_sampling_filter():
+    """Test sampled events are thinned while untagged records always pass"""
+    sampler = SamplingFilter(parse_sample_rates("login_failed=0, login_attempt=1"))
+    assert not sampler.filter(_record("x", event="login_failed"))
+    kept = _record("x", event="login_attempt")
+    assert sampler.filter(kept)
+    assert kept.sample_rate == 1.0
+    assert sampler.filter(_record("x"))
+
+def test_sampling_keeps_warnings():
+    """Test warning-level records such as failed logins are never sampled out"""
+    sampler = SamplingFilter(parse_sample_rates("login_failed=0"))
+    failed = _record("x", event="login_failed")
+    failed.levelno, failed.levelname = logging.WARNING, "WARNING"
+    assert sampler.filter(failed)
+    assert not hasattr(failed, "sample_rate")
@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_metrics_endpoint_exposes_route_latency(client: TestClient, test_user_data, internal_headers):
+    """Test requests are counted per route template and timed"""
+    before = sample("http_request_duration_seconds_count", method="POST", route="/auth/register")
+    client.post("/auth/register", json=test_user_data)
+
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers=internal_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="POST",route="/auth/register",status="200"}' in response.text
+    assert sample("http_request_duration_seconds_count", method="POST", route="/auth/register") == before + 1
+
+def test_unmatched_paths_share_one_label(client: TestClient, internal_headers):
+    """Test unknown paths do not create a label per path"""
+    client.get("/no-such-page-123")
+    assert sample("http_requests_total", method="GET", route="unmatched", status="404") >= 1
+    assert 'route="/no-such-page-123"' not in client.get("/metrics", headers=internal_headers).text
+
+def test_hash_and_query_timings_recorded(client: TestClient, test_user_data):
+    """Test bcrypt and database statement timings are observed"""
+    hashes = sample("password_hash_duration_seconds_count")
+    inserts = sample("db_query_duration_seconds_count", operation="INSERT")
+    client.post("/auth/register", json=test_user_data)
+    assert sample("password_hash_duration_seconds_count") == hashes + 1
+    assert sample("db_query_duration_seconds_count", operation="INSERT") == inserts + 1
@@ -0,0 +1,76 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import auth
+from models import User
+from entitlements import entitlement_cache
+from principals import UserPrincipal, load_principal, user_cache
+from tests.conftest import TestingSessionLocal
+
+async def _deactivate(email: str):
+    async with TestingSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.email == email))).scalars().one()
+        user.is_active = False
+        await db.commit()
+
+def test_principal_cached_after_first_request(client: TestClient, auth_headers):
+    """Test get_current_user caches the principal so later requests skip the lookup"""
+    assert client.get("/user/profile", headers=auth_headers).status_code == 200
+    misses = user_cache.misses
+    assert client.get("/user/profile", headers=auth_headers).status_code == 200
+    assert user_cache.misses == misses
+    assert user_cache.hits >= 1
+
+def test_deactivation_invalidates_cached_principal(client: TestClient, test_user_data, auth_headers):
+    """Test updating a user drops the cached principal so deactivation applies immediately"""
+    assert client.get("/user/profile", headers=auth_headers).status_code == 200
+    asyncio.run(_deactivate(test_user_data["email"]))
+    response = client.get("/user/profile", headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+def test_embedded_claims(client: TestClient, test_user_data, auth_tokens, monkeypatch):
+    """Test login embeds principal claims in the token when enabled"""
+    import main
+    monkeypatch.setattr(main, "JWT_EMBED_CLAIMS", True)
+    response = client.post("/auth/login", json={
+        "email": test_user_data["email"],
+        "password": test_user_data["password"]
+    })
+    token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    payload = auth.decode_access_token(token)
+    assert payload["email"] == test_user_data["email"]
+    assert payload["active"] is True
+    assert payload["plan"] is None
+    assert client.get("/user/profile", headers=headers).status_code == 200
+
+def test_principal_lookup_primes_entitlement(client: TestClient, auth_headers, monkeypatch):
+    """Test the principal query also caches the entitlement, so no second lookup runs"""
+    monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_example")
+    assert client.get("/download/app", headers=auth_headers).status_code == 200  # creates a test subscription
+    user_cache.clear()
+    entitlement_cache.clear()
+
+    misses = entitlement_cache.misses
+    profile = client.get("/user/profile", headers=auth_headers).json()
+    assert profile["subscription"]["plan_type"] == "test_subscription"
+    assert entitlement_cache.misses == misses
+
+async def _load_principal(email: str):
+    async with TestingSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.email == email))).scalars().one()
+        return await load_principal(db, user.id)
+
+def test_principal_lookup_skips_missing_entitlement(client: TestClient, test_user_data, auth_headers):
+    """Test no subscription isn't cached, since the lookup may have hit a lagging replica"""
+    entitlement_cache.clear()
+    principal = asyncio.run(_load_principal(test_user_data["email"]))
+    assert principal.email == test_user_data["email"]
+    assert entitlement_cache.get(principal.id, "missing") == "missing"
+
+def test_principal_is_slotted():
+    """Test principals carry no per-instance __dict__"""
+    principal = UserPrincipal(id=1, email="a@example.com", is_active=True)
+    assert not hasattr(principal, "__dict__")
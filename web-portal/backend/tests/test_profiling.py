@@ -0,0 +1,57 @@
+import json
+import os
+import time
+from fastapi.testclient import TestClient
+
+import profiling
+
+
+def test_debug_header_profiles_request(client: TestClient, test_user_data, monkeypatch, tmp_path):
+    """Test a request with the admin debug token writes stacks and SQL to disk"""
+    monkeypatch.setattr(profiling, "PROFILE_DEBUG_TOKEN", "debug-token")
+    monkeypatch.setattr(profiling, "PROFILE_OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling.sampler, "interval", 0.001)
+
+    response = client.post("/auth/register", json=test_user_data, headers={"X-Debug-Profile": "debug-token"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    with open(tmp_path / "requests" / f"{profile_id}.json") as f:
+        summary = json.load(f)
+    assert summary["route"] == "/auth/register"
+    assert summary["reason"] == "debug_header"
+    assert summary["samples"] > 0
+    assert any(q["statement"].startswith("INSERT INTO users") for q in summary["queries"])
+
+    # Collapsed stacks: "frame;frame;... count", rooted at the middleware
+    lines = (tmp_path / "POST_auth_register.folded").read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert stack.startswith("profiling.py:ProfilingMiddleware.__call__")
+    assert any("main.py:register" in line for line in lines)
+
+def test_unprofiled_by_default(client: TestClient, monkeypatch, tmp_path):
+    """Test requests are not profiled without a sample rate or a valid token"""
+    monkeypatch.setattr(profiling, "PROFILE_DEBUG_TOKEN", "debug-token")
+    monkeypatch.setattr(profiling, "PROFILE_OUTPUT_DIR", str(tmp_path))
+    response = client.get("/health", headers={"X-Debug-Profile": "wrong-token"})
+    assert "X-Profile-Id" not in response.headers
+    assert not os.listdir(tmp_path)
+
+def test_profile_output_is_capped(monkeypatch, tmp_path):
+    """Test old request summaries are pruned and large folded files rotated"""
+    monkeypatch.setattr(profiling, "PROFILE_MAX_REQUESTS", 3)
+    monkeypatch.setattr(profiling, "PROFILE_MAX_FOLDED_BYTES", 64)
+    ids = []
+    for n in range(5):
+        profile = profiling.RequestProfile("GET", "/health", "sampled", root_frame=None, task=None, thread_id=0)
+        profile.stacks["main.py:health_check"] = n + 1
+        profiling.write_profile(profile, "/health", 200, output_dir=str(tmp_path))
+        ids.append(profile.id)
+        time.sleep(0.01)
+
+    assert sorted(os.listdir(tmp_path / "requests")) == sorted(f"{id_}.json" for id_ in ids[-3:])
+    assert (tmp_path / "GET_health.folded.1").exists()
+    assert (tmp_path / "GET_health.folded").stat().st_size < 64
@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+from limits import parse
+from prometheus_client import REGISTRY
+
+import rate_limit
+
+def test_login_limited_per_account(client: TestClient, test_user_data, monkeypatch):
+    """Test the per-account login budget applies before the per-IP limit (5/minute)"""
+    monkeypatch.setattr(rate_limit, "login_account_limit", parse("2/minute"))
+    client.post("/auth/register", json=test_user_data)
+    login = {"email": test_user_data["email"].upper(), "password": "WrongPassword123!"}
+
+    for _ in range(2):
+        response = client.post("/auth/login", json=login)
+        assert response.status_code == 401
+
+    rejected = REGISTRY.get_sample_value("rate_limit_rejections_total", {"scope": "login-account"}) or 0.0
+    response = client.post("/auth/login", json=login)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert REGISTRY.get_sample_value("rate_limit_rejections_total", {"scope": "login-account"}) == rejected + 1
+
+def test_sliding_window_counter_strategy():
+    """Test the shared limiter uses the sliding-window-counter algorithm"""
+    assert rate_limit.limiter._limiter.__class__.__name__ == "SlidingWindowCounterRateLimiter"
@@ -0,0 +1,45 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from models import RefreshToken
+from refresh_tokens import hash_refresh_token
+from tests.conftest import TestingSessionLocal
+
+async def _stored_token_hashes():
+    async with TestingSessionLocal() as db:
+        return (await db.execute(select(RefreshToken.token_hash))).scalars().all()
+
+def test_refresh_rotates_tokens(client: TestClient, test_user_data, auth_tokens):
+    """Test a refresh token yields a working access token and a new refresh token"""
+    assert auth_tokens["refresh_token"]
+    assert auth_tokens["expires_in"] == 30 * 60
+
+    response = client.post("/auth/refresh", json={"refresh_token": auth_tokens["refresh_token"]})
+    assert response.status_code == 200
+    refreshed = response.json()
+    assert refreshed["refresh_token"] != auth_tokens["refresh_token"]
+
+    profile = client.get("/user/profile", headers={"Authorization": f"Bearer {refreshed['access_token']}"})
+    assert profile.status_code == 200
+    assert profile.json()["email"] == test_user_data["email"]
+
+def test_refresh_tokens_stored_as_digests(client: TestClient, auth_tokens):
+    """Test only the HMAC digest of a refresh token is persisted"""
+    assert asyncio.run(_stored_token_hashes()) == [hash_refresh_token(auth_tokens["refresh_token"])]
+
+def test_reused_refresh_token_revokes_family(client: TestClient, auth_tokens):
+    """Test replaying a rotated-out token revokes every token in its family"""
+    rotated = client.post("/auth/refresh", json={"refresh_token": auth_tokens["refresh_token"]}).json()
+
+    replay = client.post("/auth/refresh", json={"refresh_token": auth_tokens["refresh_token"]})
+    assert replay.status_code == 401
+
+    # The legitimate holder's current token is revoked as well
+    response = client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+def test_unknown_refresh_token_rejected(client: TestClient):
+    """Test a refresh token that was never issued is refused"""
+    response = client.post("/auth/refresh", json={"refresh_token": "not-a-token"})
+    assert response.status_code == 401
@@ -0,0 +1,72 @@
+import asyncio
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from alembic import command
+from sqlalchemy import create_engine, func, select, text
+
+from database import alembic_config
+from main import app, limiter
+from models import User, normalize_email
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_registrations(client: TestClient, test_user_data, monkeypatch):
+    """Test parallel registrations of one address (in any case) create exactly one user"""
+    monkeypatch.setattr(limiter, "enabled", False)
+    local, domain = test_user_data["email"].split("@")
+    variants = [local, local.upper(), local.capitalize(), local] * 2
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as http:
+        responses = await asyncio.gather(*[
+            http.post("/auth/register", json={**test_user_data, "email": f"{variant}@{domain}"})
+            for variant in variants
+        ])
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200] + [400] * (len(variants) - 1)
+    async with TestingSessionLocal() as db:
+        count = await db.scalar(select(func.count()).select_from(User))
+    assert count == 1
+
+def test_duplicate_registration_skips_hashing(client: TestClient, test_user_data, monkeypatch):
+    """Test a taken address is refused before the password is hashed"""
+    import main
+    assert client.post("/auth/register", json=test_user_data).status_code == 200
+    hashes = []
+    real_hash = main.get_password_hash_async
+
+    async def counting_hash(password):
+        hashes.append(password)
+        return await real_hash(password)
+
+    monkeypatch.setattr(main, "get_password_hash_async", counting_hash)
+    response = client.post("/auth/register", json={**test_user_data, "email": test_user_data["email"].upper()})
+    assert response.status_code == 400
+    assert hashes == []
+
+def test_login_ignores_email_case(client: TestClient, test_user_data):
+    """Test login matches the address in any case and keeps the registered spelling"""
+    client.post("/auth/register", json={**test_user_data, "email": "Mixed.Case@Example.com"})
+    response = client.post("/auth/login", json={
+        "email": "mixed.case@example.com",
+        "password": test_user_data["password"]
+    })
+    assert response.status_code == 200
+    profile = client.get("/user/profile", headers={"Authorization": f"Bearer {response.json()['access_token']}"})
+    assert profile.json()["email"] == "Mixed.Case@example.com"
+
+def test_migration_backfills_with_normalize_email(tmp_path):
+    """Test existing addresses are normalized exactly as the app normalizes them at login"""
+    email = "\tÄnne@Example.COM\u00a0"
+    migrated = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    with migrated.begin() as connection:
+        command.upgrade(alembic_config(connection), "0005")
+        connection.execute(text(
+            "INSERT INTO users (email, hashed_password, full_name, is_active) VALUES (:email, 'x', 'Anne', 1)"
+        ), {"email": email})
+        command.upgrade(alembic_config(connection), "head")
+    with migrated.connect() as connection:
+        assert connection.execute(text("SELECT email_normalized FROM users")).scalar() == normalize_email(email)
+    migrated.dispose()
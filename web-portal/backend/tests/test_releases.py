@@ -0,0 +1,130 @@
+import json
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+from deltas import apply_patch
+from releases import ReleaseCatalog, release_catalog
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    builds = tmp_path / "builds"
+    builds.mkdir()
+    monkeypatch.setattr(release_catalog, "root", str(tmp_path / "releases"))
+    release_catalog.load()
+    yield release_catalog, builds
+    monkeypatch.undo()
+    release_catalog.load()
+
+def _build(builds, name: str, content: bytes) -> str:
+    path = builds / name
+    path.write_bytes(content)
+    return str(path)
+
+def test_catalog_is_content_addressed(catalog):
+    """Test identical builds share one object and the index survives a reload"""
+    catalog, builds = catalog
+    first = catalog.add("1.0.0", "windows-x86_64", _build(builds, "setup-1.0.0.exe", b"v1"))
+    same = catalog.add("1.0.0", "linux-x86_64", _build(builds, "app-1.0.0.AppImage", b"v1"))
+    second = catalog.add("1.1.0", "windows-x86_64", _build(builds, "setup-1.1.0.exe", b"v1.1"), deltas=False)
+
+    assert first.sha256 == same.sha256
+    assert len(list((builds.parent / "releases" / "objects").iterdir())) == 2
+    assert catalog.get("windows-x86_64") == second
+    assert catalog.get("windows-x86_64", "1.0.0") == first
+
+    # Another process sees the same index without rehashing
+    reloaded = ReleaseCatalog(catalog.root)
+    assert reloaded.get("windows-x86_64") == second
+    assert json.loads(reloaded.manifest)["platforms"]["linux-x86_64"]["sha256"] == same.sha256
+
+def test_catalog_skips_missing_objects(catalog):
+    """Test releases whose object is gone are left out of the catalog"""
+    catalog, builds = catalog
+    release = catalog.add("1.0.0", "windows-x86_64", _build(builds, "setup.exe", b"v1"))
+    (builds.parent / "releases" / "objects" / release.sha256).unlink()
+    catalog.load()
+    assert catalog.get("windows-x86_64") is None
+
+def test_manifest_conditional_get(client: TestClient, catalog):
+    """Test the manifest answers 304 to its ETag and changes on publish"""
+    catalog, builds = catalog
+    catalog.add("1.0.0", "windows-x86_64", _build(builds, "setup.exe", b"v1"))
+    response = client.get("/download/app/manifest")
+    assert response.status_code == 200
+    assert response.json()["platforms"]["windows-x86_64"]["version"] == "1.0.0"
+    etag = response.headers["etag"]
+
+    assert client.get("/download/app/manifest", headers={"If-None-Match": etag}).status_code == 304
+
+    catalog.add("1.1.0", "windows-x86_64", _build(builds, "setup.exe", b"v1.1"))
+    response = client.get("/download/app/manifest", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["platforms"]["windows-x86_64"]["version"] == "1.1.0"
+
+def test_download_release_by_platform_and_version(client: TestClient, auth_headers, catalog, monkeypatch):
+    """Test /download/app serves the latest or requested release per platform"""
+    catalog, builds = catalog
+    catalog.add("1.0.0", "windows-x86_64", _build(builds, "setup-1.0.0.exe", b"old build"))
+    latest = catalog.add("1.1.0", "windows-x86_64", _build(builds, "setup-1.1.0.exe", b"new build"))
+    monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_example")
+
+    info = client.get("/download/app", headers=auth_headers).json()
+    assert info["version"] == "1.1.0"
+    assert info["sha256"] == latest.sha256
+    response = client.get(info["download_url"])
+    assert response.content == b"new build"
+    assert response.headers["etag"] == f'"{latest.sha256}"'
+    assert 'filename="setup-1.1.0.exe"' in response.headers["content-disposition"]
+
+    info = client.get("/download/app", params={"version": "1.0.0"}, headers=auth_headers).json()
+    assert client.get(info["download_url"]).content == b"old build"
+
+    response = client.get("/download/app", params={"platform": "darwin-aarch64"}, headers=auth_headers)
+    assert response.status_code == 404
+
+def test_patches_built_between_releases(catalog):
+    """Test publishing builds verified patches from recent releases"""
+    catalog, builds = catalog
+    v1 = os.urandom(256 * 1024)
+    v2 = v1[:1000] + os.urandom(64) + v1[1000:]
+    v3 = v2 + os.urandom(128)
+    catalog.add("1.0.0", "windows-x86_64", _build(builds, "setup.exe", v1))
+    catalog.add("1.1.0", "windows-x86_64", _build(builds, "setup.exe", v2))
+    latest = catalog.add("1.2.0", "windows-x86_64", _build(builds, "setup.exe", v3))
+
+    patches = {(patch.from_version, patch.to_version): patch for patch in catalog.patches()}
+    assert set(patches) == {("1.0.0", "1.1.0"), ("1.0.0", "1.2.0"), ("1.1.0", "1.2.0")}
+    patch = catalog.best_download(latest, from_version="1.0.0")
+    assert patch == patches[("1.0.0", "1.2.0")]
+    assert patch.size < len(v3) // 100
+    with open(catalog.object_path(patch.sha256), "rb") as f:
+        assert apply_patch(v1, f.read()) == v3
+
+    # Unknown or current versions get the full installer
+    assert catalog.best_download(latest, from_version="0.9.0") == latest
+    assert catalog.best_download(latest, from_version="1.2.0") == latest
+    manifest = json.loads(catalog.manifest)["platforms"]["windows-x86_64"]
+    assert set(manifest["patches"]) == {"1.0.0", "1.1.0"}
+
+def test_download_serves_patch_for_from_version(client: TestClient, auth_headers, catalog, monkeypatch):
+    """Test clients naming their installed version get the smaller patch"""
+    catalog, builds = catalog
+    v1 = os.urandom(128 * 1024)
+    v2 = v1 + b"new feature"
+    catalog.add("1.0.0", "windows-x86_64", _build(builds, "setup.exe", v1))
+    catalog.add("1.1.0", "windows-x86_64", _build(builds, "setup.exe", v2))
+    monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_example")
+
+    info = client.get("/download/app", params={"from_version": "1.0.0"}, headers=auth_headers).json()
+    assert info["version"] == "1.1.0"
+    assert info["patch_from"] == "1.0.0"
+    assert info["size"] < len(v2)
+    response = client.get(info["download_url"])
+    assert response.headers["etag"] == f'"{info["sha256"]}"'
+    assert apply_patch(v1, response.content) == v2
+
+    info = client.get("/download/app", headers=auth_headers).json()
+    assert info["patch_from"] is None
+    assert client.get(info["download_url"]).content == v2
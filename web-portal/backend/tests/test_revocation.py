@@ -0,0 +1,65 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+
+from revocation import BloomFilter, RevocationList, revocation_list
+from auth import decode_access_token
+from tests.conftest import TestingSessionLocal
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test every added item is found and false positives stay near the target rate"""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [uuid.uuid4().hex for _ in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+    assert false_positives < 300  # ~1% expected
+
+def test_access_tokens_carry_unique_jti(client: TestClient, test_user_data, auth_tokens):
+    """Test each login issues an access token with its own jti"""
+    first = auth_tokens["access_token"]
+    second = client.post("/auth/login", json={"email": test_user_data["email"],
+                                              "password": test_user_data["password"]}).json()["access_token"]
+    assert decode_access_token(first)["jti"] != decode_access_token(second)["jti"]
+
+def test_logout_revokes_access_and_refresh_tokens(client: TestClient, test_user_data, auth_tokens, auth_headers):
+    """Test a logged-out token is rejected while other sessions keep working"""
+    other = client.post("/auth/login", json={"email": test_user_data["email"],
+                                             "password": test_user_data["password"]}).json()
+
+    response = client.post("/auth/logout", json={"refresh_token": auth_tokens["refresh_token"]}, headers=auth_headers)
+    assert response.status_code == 200
+
+    response = client.get("/user/profile", headers=auth_headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+    assert client.post("/auth/refresh", json={"refresh_token": auth_tokens["refresh_token"]}).status_code == 401
+
+    other_headers = {"Authorization": f"Bearer {other['access_token']}"}
+    assert client.get("/user/profile", headers=other_headers).status_code == 200
+
+def test_unrevoked_tokens_skip_the_database(client: TestClient, auth_headers):
+    """Test the not-revoked case is answered by the bloom filter alone"""
+    before = revocation_list.stats()
+    for _ in range(3):
+        client.get("/user/profile", headers=auth_headers)
+    after = revocation_list.stats()
+    assert after["lookups"] == before["lookups"] + 3
+    assert after["db_checks"] == before["db_checks"]
+
+@pytest.mark.asyncio
+async def test_refresh_loads_revocations_from_other_workers(client: TestClient, auth_tokens, auth_headers):
+    """Test a revocation recorded elsewhere is enforced after the periodic reload"""
+    jti = decode_access_token(auth_tokens["access_token"])["jti"]
+
+    other_worker = RevocationList()
+    async with TestingSessionLocal() as db:
+        await other_worker.revoke(db, jti, None, datetime.utcnow() + timedelta(minutes=5))
+        await db.commit()
+
+    assert client.get("/user/profile", headers=auth_headers).status_code == 200
+    await revocation_list.refresh()
+    assert client.get("/user/profile", headers=auth_headers).status_code == 401
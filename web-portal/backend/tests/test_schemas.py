@@ -0,0 +1,29 @@
+import pytest
+from pydantic import ValidationError
+
+from schemas import UserCreate, check_password_strength
+
+
+@pytest.mark.parametrize("password,error", [
+    ("Short1!", "at least 12 characters"),
+    ("lowercase123!", "uppercase letter"),
+    ("UPPERCASE123!", "lowercase letter"),
+    ("NoDigitsHere!!", "number"),
+    ("NoSpecials1234", "special character"),
+    ("GoodPassword123!", None),
+])
+def test_password_rules_reported_in_order(password, error):
+    """Test the single-pass checker reports the first unmet rule"""
+    result = check_password_strength(password)
+    if error is None:
+        assert result is None
+    else:
+        assert error in result
+
+def test_user_create_strips_full_name():
+    """Test full names are trimmed before the length check"""
+    user = UserCreate.model_validate({"email": "a@example.com", "password": "GoodPassword123!",
+                                      "full_name": "  Jane Doe "})
+    assert user.full_name == "Jane Doe"
+    with pytest.raises(ValidationError, match="Full name must be at least 2 characters"):
+        UserCreate.model_validate({"email": "a@example.com", "password": "GoodPassword123!", "full_name": " x "})
@@ -0,0 +1,32 @@
+import time
+from datetime import timedelta
+from fastapi.testclient import TestClient
+
+import auth
+from auth import create_access_token, decode_access_token, token_cache
+
+def test_verified_tokens_are_cached(client: TestClient):
+    """Test repeat decodes skip verification and bad tokens are never cached"""
+    token = create_access_token({"sub": "1"})
+    first = decode_access_token(token)
+    hits = token_cache.stats()["hits"]
+    assert decode_access_token(token) is first
+    assert token_cache.stats()["hits"] == hits + 1
+
+    assert decode_access_token(token[:-2] + "xx") is None
+    assert decode_access_token("not-a-token") is None
+    assert len(token_cache) == 1
+
+def test_token_cache_entry_does_not_outlive_token(client: TestClient, monkeypatch):
+    """Test a cached token expires from the cache no later than its exp"""
+    monkeypatch.setattr(auth, "JWT_CACHE_TTL", 60)
+    token = create_access_token({"sub": "1"}, expires_delta=timedelta(seconds=2))
+    first = decode_access_token(token)
+    assert decode_access_token(token) is first
+
+    # Past the token's exp on the cache clock (well within JWT_CACHE_TTL)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 2.5)
+    misses = token_cache.misses
+    decode_access_token(token)
+    assert token_cache.misses == misses + 1
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from entitlements import entitlement_cache
+from models import StripeEvent, UserSubscription
+from tests.conftest import TestingSessionLocal
+import webhooks
+from webhooks import process_pending_events
+
+def _checkout_completed(event_id: str, user_id: int) -> dict:
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "id": "cs_test_1",
+            "object": "checkout.session",
+            "customer": "cus_1",
+            "subscription": "sub_1",
+            "metadata": {"user_id": str(user_id), "plan_type": "monthly"},
+        }},
+    }
+
+def _subscription_deleted(event_id: str) -> dict:
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "customer.subscription.deleted",
+        "data": {"object": {"id": "sub_1", "object": "subscription", "status": "canceled"}},
+    }
+
+async def _drain() -> int:
+    async with TestingSessionLocal() as db:
+        return await process_pending_events(db)
+
+async def _scalar(stmt):
+    async with TestingSessionLocal() as db:
+        return (await db.execute(stmt)).scalar()
+
+def _register(client: TestClient, test_user_data) -> int:
+    return client.post("/auth/register", json=test_user_data).json()["id"]
+
+def test_webhook_rejects_bad_signature(client: TestClient):
+    """Test unsigned payloads are refused before anything is queued"""
+    response = client.post("/webhook/stripe", content=b"{}", headers={"stripe-signature": "t=1,v1=bad"})
+    assert response.status_code == 400
+
+def test_webhook_queues_and_deduplicates_events(client: TestClient, test_user_data, post_stripe_event):
+    """Test retried deliveries are acked but only queued and applied once"""
+    user_id = _register(client, test_user_data)
+    event = _checkout_completed("evt_1", user_id)
+    assert post_stripe_event(event).status_code == 200
+    assert post_stripe_event(event).status_code == 200
+    assert asyncio.run(_scalar(select(func.count()).select_from(StripeEvent))) == 1
+
+    entitlement_cache.set(user_id, None)
+    assert asyncio.run(_drain()) == 1
+    assert asyncio.run(_drain()) == 0
+    assert asyncio.run(_scalar(select(func.count()).select_from(UserSubscription))) == 1
+    assert user_id not in entitlement_cache
+
+def test_webhook_subscription_deleted(client: TestClient, test_user_data, post_stripe_event, monkeypatch):
+    """Test cancellation deactivates the subscription, retrying if it arrives first"""
+    monkeypatch.setattr(webhooks, "WEBHOOK_RETRY_BACKOFF", 0)
+    user_id = _register(client, test_user_data)
+    post_stripe_event(_subscription_deleted("evt_2"))
+    assert asyncio.run(_drain()) == 0
+    assert asyncio.run(_scalar(select(StripeEvent.attempts).where(StripeEvent.id == "evt_2"))) == 1
+
+    post_stripe_event(_checkout_completed("evt_1", user_id))
+    asyncio.run(_drain())
+    asyncio.run(_drain())
+    assert asyncio.run(_scalar(select(UserSubscription.is_active))) is False
+    assert asyncio.run(_scalar(select(UserSubscription.status))) == "canceled"
+
+def test_webhook_not_ready_event_backs_off(client: TestClient, post_stripe_event):
+    """Test a failed event is deferred instead of retried on every poll"""
+    post_stripe_event(_subscription_deleted("evt_2"))
+    assert asyncio.run(_drain()) == 0
+    assert asyncio.run(_drain()) == 0
+    assert asyncio.run(_scalar(select(StripeEvent.attempts).where(StripeEvent.id == "evt_2"))) == 1
+    next_attempt_at = asyncio.run(_scalar(select(StripeEvent.next_attempt_at).where(StripeEvent.id == "evt_2")))
+    assert next_attempt_at > datetime.utcnow()
+    assert webhooks.retry_delay(3).total_seconds() == webhooks.WEBHOOK_RETRY_BACKOFF * 4
+    assert webhooks.retry_delay(50).total_seconds() == webhooks.WEBHOOK_RETRY_MAX_DELAY
+
+def test_webhook_skips_foreign_checkout_sessions(client: TestClient, post_stripe_event):
+    """Test a checkout session without this app's metadata is settled, not retried"""
+    event = _checkout_completed("evt_3", 1)
+    event["data"]["object"]["metadata"] = {}
+    post_stripe_event(event)
+    assert asyncio.run(_drain()) == 0
+
+    row = asyncio.run(_scalar(select(StripeEvent).where(StripeEvent.id == "evt_3")))
+    assert row.processed_at is not None
+    assert row.attempts == 1
+    assert "metadata" in row.last_error
+    assert asyncio.run(_scalar(select(func.count()).select_from(UserSubscription))) == 0
@@ -0,0 +1,238 @@
+from datetime import datetime, timedelta
+from typing import Optional, Set
+import asyncio
+import json
+import logging
+import os
+from dotenv import load_dotenv
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, get_async_engine
+from entitlements import invalidate_entitlement
+from metrics import WEBHOOK_EVENTS, WEBHOOK_LAG
+from models import StripeEvent, UserSubscription
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Webhook queue worker configuration
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "5"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "10"))
+# Failed events wait WEBHOOK_RETRY_BACKOFF * 2**(attempts - 1) seconds, capped,
+# so out-of-order events get hours (not one poll per attempt) to become ready
+WEBHOOK_RETRY_BACKOFF = float(os.getenv("WEBHOOK_RETRY_BACKOFF", "5"))
+WEBHOOK_RETRY_MAX_DELAY = float(os.getenv("WEBHOOK_RETRY_MAX_DELAY", "3600"))
+
+# Stripe subscription statuses that grant access
+ACTIVE_SUBSCRIPTION_STATUSES = {"active", "trialing"}
+
+
+class EventNotReady(Exception):
+    """The event refers to state that has not arrived yet; retry it later"""
+
+
+class EventSkipped(Exception):
+    """The event is not for this app or is malformed; retrying can't help"""
+
+
+async def enqueue_event(db: AsyncSession, event: dict, payload: bytes) -> bool:
+    """Persist a verified event; returns False if Stripe already delivered it"""
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(StripeEvent).values(
+        id=event["id"],
+        type=event["type"],
+        payload=payload.decode("utf-8"),
+        received_at=datetime.utcnow(),
+        attempts=0,
+    ).on_conflict_do_nothing(index_elements=["id"])
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def _subscription_by_stripe_id(db: AsyncSession, stripe_subscription_id: str) -> Optional[UserSubscription]:
+    result = await db.execute(
+        select(UserSubscription).where(UserSubscription.stripe_subscription_id == stripe_subscription_id)
+    )
+    return result.scalars().first()
+
+
+async def _handle_checkout_completed(db: AsyncSession, session: dict) -> Optional[int]:
+    # Sessions created elsewhere on the Stripe account lack this app's metadata
+    metadata = session.get("metadata") or {}
+    user_id, plan_type = metadata.get("user_id"), metadata.get("plan_type")
+    if not isinstance(user_id, str) or not user_id.isdigit() or not plan_type:
+        raise EventSkipped(f"Checkout session {session.get('id')} has no user_id/plan_type metadata")
+    user_id = int(user_id)
+    stripe_subscription_id = session.get("subscription")
+    if stripe_subscription_id and await _subscription_by_stripe_id(db, stripe_subscription_id):
+        # Already recorded (e.g. an update event created it first)
+        return user_id
+    db.add(UserSubscription(
+        user_id=user_id,
+        plan_type=plan_type,
+        stripe_customer_id=session.get("customer"),
+        stripe_subscription_id=stripe_subscription_id,
+        status="active",
+        is_active=True
+    ))
+    return user_id
+
+
+async def _handle_subscription_changed(db: AsyncSession, stripe_subscription: dict, deleted: bool) -> Optional[int]:
+    subscription = await _subscription_by_stripe_id(db, stripe_subscription["id"])
+    if subscription is None:
+        # Stripe does not guarantee ordering; the checkout event may still be queued
+        raise EventNotReady(f"Unknown subscription {stripe_subscription['id']}")
+    status = "canceled" if deleted else stripe_subscription.get("status", subscription.status)
+    subscription.status = status
+    subscription.is_active = not deleted and status in ACTIVE_SUBSCRIPTION_STATUSES
+    period_end = stripe_subscription.get("current_period_end")
+    if period_end:
+        subscription.expires_at = datetime.utcfromtimestamp(period_end)
+    return subscription.user_id
+
+
+async def apply_event(db: AsyncSession, event: dict) -> Optional[int]:
+    """Apply one Stripe event; returns the affected user id, if any"""
+    event_type = event["type"]
+    obj = event["data"]["object"]
+    if event_type == "checkout.session.completed":
+        return await _handle_checkout_completed(db, obj)
+    if event_type == "customer.subscription.updated":
+        return await _handle_subscription_changed(db, obj, deleted=False)
+    if event_type == "customer.subscription.deleted":
+        return await _handle_subscription_changed(db, obj, deleted=True)
+    return None
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next attempt of an event that has failed `attempts` times"""
+    return timedelta(seconds=min(WEBHOOK_RETRY_BACKOFF * 2 ** (attempts - 1), WEBHOOK_RETRY_MAX_DELAY))
+
+
+async def process_pending_events(db: AsyncSession, batch_size: int = WEBHOOK_BATCH_SIZE) -> int:
+    """Process one batch of queued events that are due; returns how many succeeded"""
+    now = datetime.utcnow()
+    result = await db.execute(
+        select(StripeEvent)
+        .where(
+            StripeEvent.processed_at.is_(None),
+            StripeEvent.attempts < WEBHOOK_MAX_ATTEMPTS,
+            or_(StripeEvent.next_attempt_at.is_(None), StripeEvent.next_attempt_at <= now),
+        )
+        .order_by(StripeEvent.received_at)
+        .limit(batch_size)
+        # Several workers may poll at once; each claims a disjoint batch (Postgres)
+        .with_for_update(skip_locked=True)
+    )
+    events = result.scalars().all()
+    affected_users: Set[int] = set()
+    processed = 0
+    for queued in events:
+        queued.attempts += 1
+        try:
+            async with db.begin_nested():
+                user_id = await apply_event(db, json.loads(queued.payload))
+        except EventSkipped as e:
+            queued.processed_at = datetime.utcnow()
+            queued.last_error = str(e)
+            WEBHOOK_EVENTS.labels("skipped").inc()
+            logger.warning("Stripe event %s (%s) skipped: %s", queued.id, queued.type, e)
+            continue
+        except Exception as e:
+            queued.last_error = str(e)
+            queued.next_attempt_at = datetime.utcnow() + retry_delay(queued.attempts)
+            not_ready = isinstance(e, EventNotReady)
+            WEBHOOK_EVENTS.labels("retry" if not_ready else "error").inc()
+            level = logging.INFO if not_ready else logging.ERROR
+            logger.log(level, "Stripe event %s (%s) failed, attempt %d: %s",
+                       queued.id, queued.type, queued.attempts, e)
+            continue
+        queued.processed_at = datetime.utcnow()
+        queued.last_error = None
+        queued.next_attempt_at = None
+        processed += 1
+        WEBHOOK_EVENTS.labels("processed").inc()
+        WEBHOOK_LAG.labels(queued.type).observe((queued.processed_at - queued.received_at).total_seconds())
+        if user_id is not None:
+            affected_users.add(user_id)
+    await db.commit()
+    for user_id in affected_users:
+        invalidate_entitlement(user_id)
+    return processed
+
+
+async def pending_event_stats(db: AsyncSession) -> dict:
+    """Queue depth and age of the oldest unprocessed event (uses the partial index)"""
+    retryable = StripeEvent.attempts < WEBHOOK_MAX_ATTEMPTS
+    result = await db.execute(
+        select(
+            func.count().filter(retryable),
+            func.count().filter(~retryable),
+            func.min(StripeEvent.received_at).filter(retryable),
+        ).where(StripeEvent.processed_at.is_(None))
+    )
+    pending, failed, oldest = result.one()
+    lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    return {"pending": pending, "failed": failed, "oldest_age_seconds": round(lag, 3)}
+
+
+class WebhookWorker:
+    """Background task draining the Stripe event queue in batches"""
+
+    def __init__(self, batch_size: int = WEBHOOK_BATCH_SIZE, poll_interval: float = WEBHOOK_POLL_INTERVAL):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def notify(self):
+        """Wake the worker after enqueueing instead of waiting for the next poll"""
+        self._wakeup.set()
+
+    async def drain(self):
+        """Process full batches until the queue is empty or a batch hits failures"""
+        while True:
+            async with AsyncSessionLocal(bind=get_async_engine()) as db:
+                processed = await process_pending_events(db, self.batch_size)
+            if processed < self.batch_size:
+                return
+
+    async def _run(self):
+        while True:
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Stripe webhook worker iteration failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+webhook_worker = WebhookWorker()
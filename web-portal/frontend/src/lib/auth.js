@@ -39,13 +39,84 @@ apiClient.interceptors.request.use((config) => {
   return config;
 });
 
-// Handle auth errors
+// Exchange the stored refresh token for new tokens; concurrent 401s share one call
+let refreshPromise = null;
+
+// Tabs share the refresh token through localStorage. Replaying one another tab
+// has already rotated trips reuse detection and revokes the whole session, so
+// refreshes are serialized across tabs with a Web Lock.
+const REFRESH_LOCK = "auth-refresh";
+
+function storeTokens({ access_token, refresh_token }) {
+  localStorage.setItem("token", access_token);
+  if (refresh_token) {
+    localStorage.setItem("refresh_token", refresh_token);
+  }
+  token.set(access_token);
+}
+
+function withRefreshLock(callback) {
+  if (typeof navigator !== "undefined" && navigator.locks) {
+    return navigator.locks.request(REFRESH_LOCK, callback);
+  }
+  return callback();
+}
+
+async function refreshUnlessRotated(staleRefreshToken) {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) {
+    // Logged out in another tab while this one waited for the lock
+    throw new Error("No refresh token");
+  }
+  if (refreshToken !== staleRefreshToken) {
+    // Another tab refreshed while this one waited; use its tokens
+    const accessToken = localStorage.getItem("token");
+    token.set(accessToken);
+    return accessToken;
+  }
+  const response = await axios.post(`${API_BASE}/auth/refresh`, {
+    refresh_token: refreshToken,
+  });
+  storeTokens(response.data);
+  return response.data.access_token;
+}
+
+async function refreshSession() {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) {
+    throw new Error("No refresh token");
+  }
+  if (!refreshPromise) {
+    refreshPromise = withRefreshLock(() =>
+      refreshUnlessRotated(refreshToken),
+    ).finally(() => {
+      refreshPromise = null;
+    });
+  }
+  return refreshPromise;
+}
+
+// Handle auth errors: refresh once and retry, otherwise log out. A 401 from
+// /auth/* (e.g. wrong password) is the caller's to handle, not a stale session.
 apiClient.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response?.status === 401) {
-      logout();
+  async (error) => {
+    const config = error.config;
+    const isAuthEndpoint = config?.url?.startsWith("/auth/");
+    if (error.response?.status !== 401 || !config || isAuthEndpoint) {
+      return Promise.reject(error);
     }
+    if (!config._retried) {
+      config._retried = true;
+      try {
+        const accessToken = await refreshSession();
+        config.headers.Authorization = `Bearer ${accessToken}`;
+        return apiClient(config);
+      } catch (refreshError) {
+        // Fall through to logout
+      }
+    }
+    logout();
     return Promise.reject(error);
   },
 );
@@ -74,9 +145,7 @@ export async function login(email, password) {
       password,
     });
 
-    const { access_token } = response.data;
-    localStorage.setItem("token", access_token);
-    token.set(access_token);
+    storeTokens(response.data);
 
     // Get user profile
     await getUserProfile();
@@ -88,9 +157,23 @@ export async function login(email, password) {
 }
 
 export async function logout() {
+  const accessToken = localStorage.getItem("token");
+  const refreshToken = localStorage.getItem("refresh_token");
   localStorage.removeItem("token");
+  localStorage.removeItem("refresh_token");
   token.set(null);
   user.set(null);
+
+  // Best effort: revoke the session server-side (fails harmlessly if already invalid)
+  if (accessToken) {
+    axios
+      .post(
+        `${API_BASE}/auth/logout`,
+        { refresh_token: refreshToken },
+        { headers: { Authorization: `Bearer ${accessToken}` } },
+      )
+      .catch(() => {});
+  }
 }
 
 export async function getUserProfile() {